@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the TOOLS data pipeline on synthetic, scaled fixtures.
+
+Fixtures (generated fresh into a temp dir, or --fixtures-dir to keep them):
+  - Geraeteliste.xlsx         200 x scale gear rows with the real column set
+  - Geraeteliste sheets.xlsx  the same rows on 4 sheets (a quarter each), for the multi-sheet conversion
+  - Patchbay wide/tall .xlsx  wide: 16 x scale device rows per matrix; legacy tall: 32 x scale channel rows
+  - manual .pdf / .html       2 x scale pages / sections of manual-like text with control labels
+
+--target adds a 500x scale: 100k gear rows, the inventory size the gear path is built for; only the gear cases
+(conversion, gear id resolution with its near-duplicate join, profile generation).
+
+Timed (best of --repeat): convert_gear_xlsx, convert_sources over the 4-sheet workbook (process pool, one worker
+per core), convert_patchbay_xlsx (wide + tall), extract_controls_from_text,
+pdf_to_text (all pages), html_to_text, gear id resolution with near-duplicate detection (gear_ids.py)
+and profile generation (cold, into an empty dir).
+Startup: the cumulative import time of each script module in a fresh interpreter (python -X importtime),
+so a heavy import creeping back to module level shows up as a regression. The cause itself (pandas, openpyxl,
+requests or pypdf imported at module level) fails tests/test_startup.py, which CI runs with the other tests.
+
+Results are written as JSON (--out). If a baseline exists it is compared: a case is flagged when it got
+slower than the baseline by more than --tolerance (and by more than --min-delta seconds); the exit code
+is then 1. --save-baseline stores the current results as the new baseline. The committed baseline,
+Reports/benchmark_baseline.json, holds the default scales; its meta names the machine it was taken on.
+
+Usage:
+  python tools/benchmark.py                        # 1x, 10x, 100x
+  python tools/benchmark.py --scales 1,10 --repeat 5
+  python tools/benchmark.py --save-baseline
+  python tools/benchmark.py --startup-only
+  python tools/benchmark.py --scales 1 --target    # + the 100k-row inventory (gear cases only)
+"""
+import argparse, json, platform, random, shutil, subprocess, sys, tempfile, time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import openpyxl
+
+import enrich_from_manual_map as enrich
+import excel_to_json
+import gear_ids
+import generate_device_profiles
+
+TOOLS_DIR = Path(__file__).resolve().parent
+STARTUP_MODULES = ["excel_to_json", "generate_device_profiles", "enrich_from_manual_map", "coverage_report",
+                   "profile_catalog", "evidence_index", "chain_routing", "pipeline"]
+# --target: the inventory size the vectorized converter and the gear_ids join are meant for (200 x 500 = 100k
+# rows). Opt-in, since fixtures and profile generation take minutes; only the gear cases run at this scale.
+TARGET_SCALE = 500
+MARKS = [None, None, "x", "✓", "✓ links", "rechts", "Sidechain", "?"]
+CATEGORIES = [
+    ("Effekte", "Delay", "Pedal"), ("Effekte", "Reverb", "Pedal"), ("Effekte", "Chorus / Flanger", "Pedal"),
+    ("Effekte", "Fuzz", "Pedal"), ("Synthesizer", "Desktop Synth", "Modul"), ("Synthesizer", "Drum Machine", "Groovebox"),
+    ("Studio", "Mixer", "Rack"), ("Studio", "Preamp / DI", "Rack"), ("Mikrofone", "Dynamisch", ""),
+]
+MANUFACTURERS = ["Behringer", "Boss", "Korg", "Roland", "Electro-Harmonix", "M-Vave", "Walrus Audio", "Zoom"]
+
+# ---------- fixtures ----------
+def make_gear_xlsx(path: Path, rows: int, rng: random.Random, sheets: int = 1) -> None:
+    wb = openpyxl.Workbook(write_only=True)
+    for i in range(rows):
+        if i % -(-rows // sheets) == 0:
+            ws = wb.create_sheet()
+            ws.append(excel_to_json.GEAR_COLUMNS)
+        main, sub, typ = rng.choice(CATEGORIES)
+        params = rng.sample(enrich.PARAM_NAMES, 4)
+        ws.append([
+            main, sub, typ, rng.choice(MANUFACTURERS), f"Model {i}", rng.choice([1, 1, 2, None]),
+            "In: 1x 6,3 mm Klinke\nOut: 2x 6,3 mm Klinke", " • ".join(p.title() for p in params),
+            "9V DC, 100 mA", rng.choice(["", "Stereo", "Tap Tempo, Presets"]), "",
+        ])
+    wb.save(path)
+
+def make_patchbay_wide(path: Path, devices: int, channels: int, rng: random.Random) -> None:
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for title in ("Output Kanal Patchbay", "Input Kanal Patchbay"):
+        ws.append([title] + list(range(1, channels + 1)))
+        for d in range(devices):
+            ws.append([f"{title.split()[0]} Device {d}"] + [rng.choice(MARKS) for _ in range(channels)])
+        ws.append([])
+    wb.save(path)
+
+def make_patchbay_tall(path: Path, devices: int, channels: int, rng: random.Random) -> None:
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for prefix in ("Out", "In"):
+        ws.append([None, "Kanal"] + [f"{prefix} Device {d}" for d in range(devices)])
+        for ch in range(1, channels + 1):
+            ws.append([None, ch] + [rng.choice(MARKS) for _ in range(devices)])
+        ws.append([])
+    wb.save(path)
+
+def manual_lines(n: int, rng: random.Random) -> List[str]:
+    """Manual-like prose with the label patterns the extractor looks for, plus plenty of noise."""
+    out = []
+    for _ in range(n):
+        p = rng.choice(enrich.PARAM_NAMES)
+        noun = rng.choice(enrich.CONTROL_NOUNS)
+        out.append(rng.choice([
+            f"Turn the {p} {noun} clockwise to increase the effect.",
+            f"{noun}: {p} sets how the signal is shaped before the output stage.",
+            f"{p} {rng.randint(1, 9)} {noun}",
+            "The unit ships with a 9V power supply; do not use unregulated adapters.",
+            "Refer to the quick start guide for safety information and warranty terms.",
+            f"Press and hold the {noun.lower()} for two seconds to store the preset.",
+        ]))
+    return out
+
+def _pdf_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """Minimal text-only PDF (Helvetica, one content stream per page) that pypdf can extract."""
+    objs: List[Optional[str]] = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+                                 "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        ops = "BT /F1 9 Tf 11 TL 40 810 Td " + " ".join(f"({_pdf_escape(l)}) '" for l in lines) + " ET"
+        objs.append(f"<< /Length {len(ops)} >>\nstream\n{ops}\nendstream")
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                    f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objs)} 0 R >>")
+        kids.append(len(objs))
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>"
+    buf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, start=1):
+        offsets.append(len(buf))
+        buf += f"{i} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(buf)
+    buf += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode("ascii")
+    buf += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode("ascii")
+    buf += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+    return bytes(buf)
+
+def make_html(sections: int, rng: random.Random) -> bytes:
+    parts = ["<html><head><title>Manual</title></head><body>"]
+    for s in range(sections):
+        parts.append(f"<h2>Section {s}</h2><ul>")
+        parts.extend(f"<li>{line}</li>" for line in manual_lines(30, rng))
+        parts.append("</ul>")
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+def make_fixtures(root: Path, scale: int, seed: int = 1, inventory_only: bool = False) -> Dict[str, Path]:
+    rng = random.Random(seed * 1000 + scale)
+    root.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "gear": root / "Geraeteliste.xlsx",
+        "gear_sheets": root / "Geraeteliste sheets.xlsx",
+    }
+    make_gear_xlsx(paths["gear"], 200 * scale, rng)
+    make_gear_xlsx(paths["gear_sheets"], 200 * scale, rng, sheets=4)
+    if inventory_only:
+        return paths
+    paths.update({
+        "patchbay_wide": root / "Patchbay Übersicht wide.xlsx",
+        "patchbay_tall": root / "Patchbay Übersicht tall.xlsx",
+        "pdf": root / "manual.pdf",
+        "html": root / "manual.html",
+    })
+    make_patchbay_wide(paths["patchbay_wide"], 16 * scale, 32, rng)
+    make_patchbay_tall(paths["patchbay_tall"], 16, 32 * scale, rng)
+    paths["pdf"].write_bytes(make_pdf([manual_lines(60, rng) for _ in range(2 * scale)]))
+    paths["html"].write_bytes(make_html(2 * scale, rng))
+    return paths
+
+# ---------- timing ----------
+def best_of(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return runs
+
+def resolve_ids(items: List[Dict[str, Any]]) -> gear_ids.GearIds:
+    ids = gear_ids.GearIds()
+    for it in items:
+        ids.resolve(it["id"], it["manufacturer"], it["model"])
+    ids.near_duplicates  # the blocked join runs on first access
+    return ids
+
+def bench_scale(fx: Dict[str, Path], work: Path, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Times every case the fixtures allow: inventory-only fixtures get the gear cases only."""
+    items = excel_to_json.convert_gear_xlsx(fx["gear"])["gear"]
+    out, docs = work / "device_profiles", work / "docs"
+
+    def fresh_profiles_dir():
+        for d in (out, docs):
+            shutil.rmtree(d, ignore_errors=True)
+
+    cases = {
+        "convert_gear_xlsx": (lambda: excel_to_json.convert_gear_xlsx(fx["gear"]), None, f"{len(items)} rows"),
+        "convert_sources[gear, 4 sheets]": (
+            lambda: excel_to_json.convert_sources(excel_to_json.convert_gear_xlsx, [fx["gear_sheets"]]), None,
+            f"{len(items)} rows"),
+        "gear_ids.resolve": (lambda: resolve_ids(items), None, f"{len(items)} items"),
+        "generate_profiles": (lambda: generate_device_profiles.generate_profiles(iter(items), "benchmark", out, docs),
+                              fresh_profiles_dir, f"{len(items)} items"),
+    }
+    if "pdf" in fx:
+        pdf_bytes = fx["pdf"].read_bytes()
+        text = "\n".join([enrich.pdf_to_text(pdf_bytes, max_pages=0), enrich.html_to_text(fx["html"])])
+        cases.update(documents_cases(fx, pdf_bytes, text))
+    results = {}
+    for name, (fn, setup, size) in cases.items():
+        runs = best_of(fn, repeat, setup)
+        results[name] = {"seconds": min(runs), "runs": runs, "size": size}
+    return results
+
+def documents_cases(fx: Dict[str, Path], pdf_bytes: bytes, text: str) -> Dict[str, Any]:
+    return {
+        "convert_patchbay_xlsx[wide]": (lambda: excel_to_json.convert_patchbay_xlsx(fx["patchbay_wide"]), None,
+                                        f"{fx['patchbay_wide'].stat().st_size} bytes"),
+        "convert_patchbay_xlsx[tall]": (lambda: excel_to_json.convert_patchbay_xlsx(fx["patchbay_tall"]), None,
+                                        f"{fx['patchbay_tall'].stat().st_size} bytes"),
+        "extract_controls_from_text": (lambda: enrich.extract_controls_from_text(text), None, f"{len(text)} chars"),
+        "pdf_to_text": (lambda: enrich.pdf_to_text(pdf_bytes, max_pages=0), None, f"{len(pdf_bytes)} bytes"),
+        "html_to_text": (lambda: enrich.html_to_text(fx["html"]), None, f"{fx['html'].stat().st_size} bytes"),
+    }
+
+def import_time(module: str) -> float:
+    """Cumulative import time (seconds) of a TOOLS module in a fresh interpreter, from -X importtime."""
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                       cwd=TOOLS_DIR, capture_output=True, text=True, check=True)
+    for line in r.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6
+    raise RuntimeError(f"no -X importtime entry for {module}")
+
+def bench_startup(repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for module in STARTUP_MODULES:
+        runs = [import_time(module) for _ in range(repeat)]
+        results[f"startup[{module}]"] = {"seconds": min(runs), "runs": runs, "size": "-X importtime"}
+    return results
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta: float) -> List[str]:
+    """Print current vs. baseline per case; returns the names of regressed cases."""
+    regressions = []
+    print(f"\n{'case':<40} {'baseline':>9} {'current':>9} {'ratio':>6}")
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<40} {'-':>9} {cur['seconds']:>9.4f} {'new':>6}")
+            continue
+        b, c = base["seconds"], cur["seconds"]
+        ratio = c / b if b else float("inf")
+        flag = ratio > 1 + tolerance and c - b > min_delta
+        if flag:
+            regressions.append(name)
+        print(f"{name:<40} {b:>9.4f} {c:>9.4f} {ratio:>6.2f}{'  REGRESSION' if flag else ''}")
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scales", default="1,10,100", help="comma list of fixture scale factors")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest one counts")
+    ap.add_argument("--startup-only", action="store_true", help="only measure import/startup time")
+    ap.add_argument("--target", action="store_true",
+                    help=f"also time the gear cases at {TARGET_SCALE}x ({200 * TARGET_SCALE} rows; slow)")
+    ap.add_argument("--fixtures-dir", type=Path, default=None, help="keep fixtures here (default: temp dir)")
+    ap.add_argument("--out", type=Path, default=Path("Reports/benchmark_results.json"))
+    ap.add_argument("--baseline", type=Path, default=Path("Reports/benchmark_baseline.json"))
+    ap.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs. baseline (0.25 = +25%%)")
+    ap.add_argument("--min-delta", type=float, default=0.01, help="ignore slowdowns below this many seconds")
+    args = ap.parse_args(argv)
+    scales = [] if args.startup_only else [int(s) for s in args.scales.split(",") if s.strip()]
+    if args.target and not args.startup_only and TARGET_SCALE not in scales:
+        scales.append(TARGET_SCALE)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, r in bench_startup(args.repeat).items():
+        results[name] = r
+        print(f"  {name:<40} {r['seconds']:.4f}s", flush=True)
+    with tempfile.TemporaryDirectory(prefix="ifls_bench_") as tmp:
+        root = args.fixtures_dir or Path(tmp)
+        for scale in scales:
+            t0 = time.perf_counter()
+            fx = make_fixtures(root / f"x{scale}", scale, inventory_only=scale >= TARGET_SCALE)
+            print(f"[{scale}x] fixtures in {time.perf_counter() - t0:.2f}s", flush=True)
+            for name, r in bench_scale(fx, Path(tmp) / f"work{scale}", args.repeat).items():
+                results[f"{name}@{scale}x"] = r
+                print(f"  {name:<32} {r['seconds']:.4f}s  ({r['size']})", flush=True)
+
+    doc = {
+        "meta": {
+            "generated_at_utc": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(doc, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print("Wrote:", args.out)
+
+    regressions = []
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8")).get("results", {})
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs. {args.baseline}: {', '.join(regressions)}")
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(args.out, args.baseline)
+        print("Baseline saved:", args.baseline)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
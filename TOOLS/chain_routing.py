@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Route chain presets onto the patchbay (Data/IFLS_Workbench/patchbay.json) in one pass.
+
+Model (channel rules as in Engine/IFLS_Patchbay_RoutingEngine.lua):
+- A preset becomes one or more hardware inserts, each needing HW OUT and HW IN channels:
+  - a step whose device is in both patchbay matrices (DBX 266XS, TC Electronic m350, ...) is reached
+    through that device's own patchbay points;
+  - each run of other steps (pedals) between those goes through free interface points. The interface is the
+    device with the most patched outputs (--interface to override).
+- Stereo presets (routing mode containing "stereo", or a hardware_parallel Portal) need an L/R pair:
+  "left" n + "right" n+1, else two consecutive "present" channels. Mono takes one "present" or "left" channel.
+- Channels come from the patchbay.json index (by_device / by_channel, excel_to_json.build_channel_index);
+  bitmasks use bit (ch - 1) like the index masks. Files written without an index are indexed on load.
+- solve() assigns every insert of every given preset at once, with no HW OUT or HW IN channel used twice:
+  backtracking over channel bitmasks, most constrained insert first, identical inserts in a fixed order and
+  a per-device capacity bound. Solutions are memoized per patchbay hash and demand, so presets of the same
+  shape are solved once.
+
+Presets come from chains/chain_presets.json ("presets": [...], with steps) and chain_presets/*.json
+(one preset each, with a routing_template such as "interface_out -> palmer_daccapo -> delay -> interface_in").
+
+Usage:
+  python tools/chain_routing.py                                  # validate every preset on its own
+  python tools/chain_routing.py --together preset_a preset_b     # one joint assignment for these presets
+  python tools/chain_routing.py --json
+"""
+import argparse, hashlib, json, sys
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import instrument
+import json_io
+from excel_to_json import build_channel_index, slug_id
+
+class Option(NamedTuple):
+    outs: Tuple[int, ...]
+    ins: Tuple[int, ...]
+    out_mask: int
+    in_mask: int
+
+class Insert(NamedTuple):
+    preset: str
+    device: Optional[str]  # patchbay device name (the interface for pedal runs; None if there is none)
+    width: int             # 1 = mono, 2 = stereo
+    steps: Tuple[str, ...]
+
+def mask(channels) -> int:
+    """Bit (ch - 1) per channel, as in the patchbay.json index (excel_to_json.build_channel_index)."""
+    m = 0
+    for ch in channels:
+        m |= 1 << (ch - 1)
+    return m
+
+def channel_groups(index: Dict[str, Any], device: str, width: int) -> List[Tuple[int, ...]]:
+    """Usable channel tuples of a device in one matrix index: mono singles, or L/R pairs before present pairs."""
+    dev = index["by_device"].get(device)
+    if not dev:
+        return []
+    marks = {ch: index["by_channel"][str(ch)][device] for ch in dev["channels"]}
+    if width == 1:
+        return [(n,) for n in dev["channels"] if marks[n] in ("present", "left")]
+    return [tuple(pair) for pair in dev["stereo_pairs"]] + \
+           [(n, n + 1) for n in dev["channels"] if marks[n] == "present" and marks.get(n + 1) == "present"]
+
+def matrix_index(data: Dict[str, Any], side: str) -> Dict[str, Any]:
+    """The precomputed index of one side of patchbay.json, built here only for files written without one."""
+    index = (data.get("index") or {}).get(side)
+    if index is None:
+        index = build_channel_index(data.get(side) or {})
+    return index
+
+class Patchbay:
+    """
+    The patchbay as the router sees it: the by_channel/by_device index of both matrices. A patchbay without
+    an inputs matrix has no insert points (every preset with hardware steps is unroutable).
+    """
+    def __init__(self, data: Dict[str, Any], interface: Optional[str] = None):
+        self.outs = matrix_index(data, "outputs")
+        self.ins = matrix_index(data, "inputs")
+        self.sha = hashlib.sha256(json.dumps([self.outs, self.ins], sort_keys=True).encode("utf-8")).hexdigest()
+
+        def patched(index, name):
+            return len(index["by_device"][name]["channels"])
+
+        common = [n for n in self.outs["by_device"]
+                  if n in self.ins["by_device"] and patched(self.outs, n) and patched(self.ins, n)]
+        if interface is None and common:
+            interface = max(common, key=lambda n: patched(self.outs, n))
+        if interface is not None and interface not in common:
+            raise ValueError(f"interface {interface!r} is not in both patchbay matrices")
+        self.interface = interface
+        # device id (profile slug) -> patchbay name, for devices with their own insert points
+        self.devices = {slug_id(n): n for n in common if n != interface}
+        self._options: Dict[Tuple[str, int], List[Option]] = {}
+
+    @classmethod
+    def load(cls, path: Path, interface: Optional[str] = None) -> "Patchbay":
+        return cls(json.loads(path.read_text(encoding="utf-8")), interface)
+
+    def options(self, device: str, width: int) -> List[Option]:
+        key = (device, width)
+        if key not in self._options:
+            self._options[key] = [Option(o, i, mask(o), mask(i))
+                                  for o in channel_groups(self.outs, device, width)
+                                  for i in channel_groups(self.ins, device, width)]
+        return self._options[key]
+
+    def capacity(self, device: str) -> Tuple[int, int]:
+        """Bitmasks of every channel the device's inserts can use (outputs, inputs)."""
+        opts = self.options(device, 1) + self.options(device, 2)
+        out_m = in_m = 0
+        for o in opts:
+            out_m |= o.out_mask
+            in_m |= o.in_mask
+        return out_m, in_m
+
+# ---------- presets ----------
+def load_presets(paths: List[Path]) -> List[Dict[str, Any]]:
+    """Presets from combined files ({"presets": [...]}) and single-preset files, first id wins."""
+    presets: Dict[str, Dict[str, Any]] = {}
+    for path in paths:
+        files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+        for f in files:
+            data = json.loads(f.read_text(encoding="utf-8"))
+            for p in data.get("presets", [data]) if isinstance(data, dict) else []:
+                if isinstance(p, dict) and p.get("id"):
+                    presets.setdefault(p["id"], p)
+    return list(presets.values())
+
+def preset_steps(preset: Dict[str, Any], known_ids) -> List[Dict[str, Any]]:
+    if preset.get("steps"):
+        return preset["steps"]
+    # "interface_out -> a -> b -> interface_in": the ends are the send/return, tokens in between are steps
+    tokens = [t.strip() for t in (preset.get("routing_template") or "").split("->") if t.strip()]
+    return [{"role": t, "device_id": t if t in known_ids else None} for t in tokens[1:-1]]
+
+def preset_width(preset: Dict[str, Any]) -> int:
+    mode = str((preset.get("recommended_routing") or {}).get("mode") or "")
+    return 2 if "stereo" in mode or preset.get("hardware_parallel") else 1
+
+def preset_inserts(preset: Dict[str, Any], pb: Patchbay, known_ids=()) -> List[Insert]:
+    width = preset_width(preset)
+    inserts: List[Insert] = []
+    run: List[str] = []
+    for step in preset_steps(preset, set(known_ids) | set(pb.devices)):
+        name = pb.devices.get(step.get("device_id") or "")
+        if name:
+            if run:
+                inserts.append(Insert(preset["id"], pb.interface, width, tuple(run)))
+                run = []
+            inserts.append(Insert(preset["id"], name, width, (step["device_id"],)))
+        else:
+            run.append(step.get("device_id") or step.get("role") or "?")
+    if run:
+        inserts.append(Insert(preset["id"], pb.interface, width, tuple(run)))
+    return inserts
+
+# ---------- solver ----------
+_memo: Dict[Tuple[str, Tuple[Tuple[str, int], ...]], Optional[List[Option]]] = {}
+
+def _search(demand: List[Tuple[str, int]], pb: Patchbay) -> Optional[List[Option]]:
+    n = len(demand)
+    opts = [pb.options(d, w) for d, w in demand]
+    caps = {d: pb.capacity(d) for d, _ in demand}
+    # channels each device still needs from position k on (for the capacity bound)
+    need: List[Dict[str, int]] = [dict() for _ in range(n + 1)]
+    for k in range(n - 1, -1, -1):
+        need[k] = dict(need[k + 1])
+        need[k][demand[k][0]] = need[k].get(demand[k][0], 0) + demand[k][1]
+    chosen: List[int] = [0] * n
+    failed = set()
+
+    def bt(k: int, out_m: int, in_m: int) -> bool:
+        if k == n:
+            return True
+        # identical inserts are interchangeable: only try them in increasing option order
+        start = chosen[k - 1] if k and demand[k - 1] == demand[k] else 0
+        state = (k, out_m, in_m, start)
+        if state in failed:
+            return False
+        for dev, cnt in need[k].items():
+            cap_out, cap_in = caps[dev]
+            if bin(cap_out & ~out_m).count("1") < cnt or bin(cap_in & ~in_m).count("1") < cnt:
+                failed.add(state)
+                return False
+        for idx in range(start, len(opts[k])):
+            o = opts[k][idx]
+            if o.out_mask & out_m or o.in_mask & in_m:
+                continue
+            chosen[k] = idx
+            if bt(k + 1, out_m | o.out_mask, in_m | o.in_mask):
+                return True
+        failed.add(state)
+        return False
+
+    return [opts[k][chosen[k]] for k in range(n)] if bt(0, 0, 0) else None
+
+def solve(inserts: List[Insert], pb: Patchbay) -> Optional[List[Option]]:
+    """One Option per insert (same order) with no channel used twice, or None if there is none."""
+    # most constrained first; equal demands next to each other for symmetry breaking
+    order = sorted(range(len(inserts)),
+                   key=lambda k: (len(pb.options(inserts[k].device, inserts[k].width)),
+                                  inserts[k].device or "", inserts[k].width))
+    demand = tuple((inserts[k].device, inserts[k].width) for k in order)
+    key = (pb.sha, demand)
+    if key not in _memo:
+        with instrument.span("route_solve", inserts=len(demand)) as s:
+            _memo[key] = _search(list(demand), pb)
+            s["solved"] = _memo[key] is not None
+    found = _memo[key]
+    if found is None:
+        return None
+    out: List[Optional[Option]] = [None] * len(inserts)
+    for k, o in zip(order, found):
+        out[k] = o
+    return out  # type: ignore[return-value]
+
+def solve_together(presets: List[Dict[str, Any]], pb: Patchbay, known_ids=()):
+    """
+    Joint assignment for presets in the given order; a preset that does not fit next to the ones before it is
+    left out. Returns (routed inserts with their options, ids of presets left out).
+    """
+    inserts: List[Insert] = []
+    left_out: List[str] = []
+    for p in presets:
+        mine = preset_inserts(p, pb, known_ids)
+        if solve(inserts + mine, pb) is None:
+            left_out.append(p["id"])
+        else:
+            inserts += mine
+    options = solve(inserts, pb) or []
+    return list(zip(inserts, options)), left_out
+
+def describe(ins: Insert, opt: Option) -> str:
+    fmt = "/".join
+    return f"{ins.device}: OUT {fmt(map(str, opt.outs))} IN {fmt(map(str, opt.ins))} ({', '.join(ins.steps)})"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--patchbay", type=Path, default=Path("Data/IFLS_Workbench/patchbay.json"))
+    ap.add_argument("--presets", type=Path, nargs="+",
+                    default=[Path("Data/IFLS_Workbench/chains/chain_presets.json"),
+                             Path("Data/IFLS_Workbench/chain_presets")],
+                    help="preset files and/or directories of preset files")
+    ap.add_argument("--profiles-dir", type=Path, default=Path("Data/IFLS_Workbench/device_profiles"),
+                    help="device ids for routing_template tokens")
+    ap.add_argument("--interface", default=None, help="patchbay name of the audio interface (default: most outputs)")
+    ap.add_argument("--together", nargs="*", default=None,
+                    help="route these preset ids (all presets if none given) at the same time")
+    ap.add_argument("--json", action="store_true", help="print the assignment as JSON")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.start(args.trace, args.profile)
+
+    pb = Patchbay.load(args.patchbay, args.interface)
+    presets = load_presets(args.presets)
+    known_ids = {p.stem for p in args.profiles_dir.glob("*.json")}
+    by_id = {p["id"]: p for p in presets}
+
+    if args.together is not None:
+        unknown = [i for i in args.together if i not in by_id]
+        if unknown:
+            ap.error(f"unknown preset(s): {', '.join(unknown)}")
+        chosen = [by_id[i] for i in args.together] if args.together else presets
+        routed, left_out = solve_together(chosen, pb, known_ids)
+        if args.json:
+            print(json_io.dumps({"routed": [{**ins._asdict(), "steps": list(ins.steps), "out": list(o.outs),
+                                             "in": list(o.ins)} for ins, o in routed], "left_out": left_out}))
+        else:
+            for ins, o in routed:
+                print(f"{ins.preset:<48} {describe(ins, o)}")
+            for pid in left_out:
+                print(f"{pid:<48} does not fit next to the presets above")
+        return 1 if left_out else 0
+
+    results = []
+    for p in presets:
+        inserts = preset_inserts(p, pb, known_ids)
+        opts = solve(inserts, pb)
+        results.append((p, inserts, opts))
+    bad = [p["id"] for p, _, opts in results if opts is None]
+    if args.json:
+        print(json_io.dumps({p["id"]: None if opts is None else
+                             [{"device": i.device, "width": i.width, "steps": list(i.steps), "out": list(o.outs),
+                               "in": list(o.ins)} for i, o in zip(inserts, opts)]
+                             for p, inserts, opts in results}))
+    else:
+        for p, inserts, opts in results:
+            mode = "stereo" if preset_width(p) == 2 else "mono"
+            if opts is None:
+                print(f"{p['id']:<48} {mode:<6} UNROUTABLE")
+            elif not inserts:
+                print(f"{p['id']:<48} {mode:<6} no hardware steps")
+            else:
+                print(f"{p['id']:<48} {mode:<6} " + " | ".join(describe(i, o) for i, o in zip(inserts, opts)))
+        print(f"\nPresets: {len(results)} ({len(bad)} unroutable), interface: {pb.interface}")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
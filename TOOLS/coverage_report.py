@@ -1,40 +1,120 @@
 #!/usr/bin/env python3
-import json
+"""
+Coverage report over Data/IFLS_Workbench/device_profiles.
+
+Rows come from the SQLite catalog (profile_catalog.py), which only re-reads profiles that changed.
+Outputs go to Docs/coverage_report.{csv,json,xlsx} and are only rewritten when the report changed;
+--timestamped restores the old coverage_report_<UTC>.* naming.
+
+Usage:
+  python tools/coverage_report.py                       # csv + xlsx (default)
+  python tools/coverage_report.py --formats csv,json    # fast, no XLSX
+  python tools/coverage_report.py --summary-only        # print/write only the priority x completeness summary
+"""
+import argparse, csv, io, os
 from pathlib import Path
-import pandas as pd
 from datetime import datetime, timezone
 
-def main():
-    base = Path("Data/IFLS_Workbench/device_profiles")
-    rows=[]
-    for p in base.glob("*.json"):
-        obj=json.loads(p.read_text(encoding="utf-8"))
-        controls=obj.get("controls") or []
-        ms=obj.get("manual_sources") or []
-        meta=obj.get("meta") or {}
-        rows.append({
-            "id": obj.get("id"),
-            "name_de": obj.get("name_de"),
-            "manufacturer": obj.get("manufacturer"),
-            "model": obj.get("model"),
-            "priority_group": obj.get("priority_group"),
-            "category_de": obj.get("category_de"),
-            "controls_count": len(controls),
-            "manual_sources_count": len(ms),
-            "controls_completeness": meta.get("controls_completeness",""),
-            "manual_verified": bool(meta.get("manual_verified")),
-            "panel_verified": bool(meta.get("panel_verified")) or bool(obj.get("controls_verified_by_image")),
-        })
-    df=pd.DataFrame(rows).sort_values(["priority_group","manufacturer","name_de"])
-    out_dir=Path("Docs")
+import instrument
+import json_io
+from profile_catalog import ProfileCatalog, ROW_COLUMNS
+
+SUMMARY_COLUMNS = ["priority_group", "controls_completeness", "devices"]
+
+def _sort_key(row, cols):
+    # like DataFrame.sort_values: missing values last in every column
+    return tuple((row[c] is None, row[c] if row[c] is not None else "") for c in cols)
+
+def sort_rows(rows):
+    return sorted(rows, key=lambda r: _sort_key(r, ["priority_group", "manufacturer", "name_de"]))
+
+def summarize(rows):
+    """Device count per (priority_group, controls_completeness); rows missing either key are skipped."""
+    counts = {}
+    for r in rows:
+        key = (r["priority_group"], r["controls_completeness"])
+        if None in key:
+            continue
+        counts[key] = counts.get(key, 0) + 1
+    return [{"priority_group": g, "controls_completeness": c, "devices": n} for (g, c), n in sorted(counts.items())]
+
+def to_csv(rows, columns) -> str:
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(columns)
+    for r in rows:
+        w.writerow(["" if r[c] is None else r[c] for c in columns])
+    return buf.getvalue()
+
+def write_xlsx(path: Path, rows, summary) -> None:
+    """Write-only openpyxl workbook: rows are streamed with ws.append instead of cell-by-cell writes."""
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    for title, columns, data in (("coverage", ROW_COLUMNS, rows), ("summary", SUMMARY_COLUMNS, summary)):
+        ws = wb.create_sheet(title)
+        ws.append(columns)
+        for r in data:
+            ws.append([r[c] for c in columns])
+    tmp = json_io.tmp_path(path)
+    try:
+        wb.save(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def write_if_changed(path: Path, text: str) -> bool:
+    with instrument.span("write", path=str(path)) as s:
+        if path.exists() and path.read_text(encoding="utf-8") == text:
+            s["wrote"] = False
+            return False
+        json_io.write_text(path, text)
+        s["wrote"], s["bytes"] = True, len(text.encode("utf-8"))
+        return True
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profiles-dir", type=Path, default=Path("Data/IFLS_Workbench/device_profiles"))
+    ap.add_argument("--out-dir", type=Path, default=Path("Docs"))
+    ap.add_argument("--formats", default="csv,xlsx", help="comma list of csv, json, xlsx")
+    ap.add_argument("--summary-only", action="store_true", help="print the summary and write only coverage_summary.csv")
+    ap.add_argument("--timestamped", action="store_true", help="write coverage_report_<UTC>.* files (old behaviour)")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.start(args.trace, args.profile)
+    formats = {f.strip() for f in args.formats.split(",") if f.strip()}
+
+    cat = ProfileCatalog(args.profiles_dir)
+    with instrument.span("catalog_refresh", profiles_dir=str(args.profiles_dir)) as s:
+        s.update(cat.refresh())
+    rows = sort_rows(cat.rows())
+    cat.close()
+    summary = summarize(rows)
+
+    out_dir = args.out_dir
     out_dir.mkdir(exist_ok=True)
-    ts=datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-    df.to_csv(out_dir/f"coverage_report_{ts}.csv", index=False)
-    with pd.ExcelWriter(out_dir/f"coverage_report_{ts}.xlsx", engine="openpyxl") as w:
-        df.to_excel(w, index=False, sheet_name="coverage")
-        (df.groupby(["priority_group","controls_completeness"]).size().reset_index(name="devices")
-         ).to_excel(w, index=False, sheet_name="summary")
-    print("Wrote", ts)
+    if args.summary_only:
+        text = to_csv(summary, SUMMARY_COLUMNS)
+        print(text, end="")
+        write_if_changed(out_dir/"coverage_summary.csv", text)
+        return
+
+    ts = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    stem = f"coverage_report_{ts}" if args.timestamped else "coverage_report"
+    csv_text = to_csv(rows, ROW_COLUMNS)
+    changed = False
+    if "csv" in formats:
+        changed |= write_if_changed(out_dir/f"{stem}.csv", csv_text)
+    if "json" in formats:
+        changed |= write_if_changed(out_dir/f"{stem}.json",
+                                    json_io.dumps({"devices": rows, "summary": summary})+"\n")
+    xlsx = out_dir/f"{stem}.xlsx"
+    # the XLSX is the slow one: skip it when the text outputs show nothing changed
+    if "xlsx" in formats and (changed or not formats & {"csv", "json"} or not xlsx.exists()):
+        with instrument.span("write", path=str(xlsx)) as s:
+            write_xlsx(xlsx, rows, summary)
+            s["wrote"], s["bytes"] = True, xlsx.stat().st_size
+        changed = True
+    print("Wrote" if changed else "Unchanged", stem)
 
 if __name__ == "__main__":
     main()
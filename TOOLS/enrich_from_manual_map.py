@@ -16,16 +16,47 @@ Usage:
   python tools/enrich_from_manual_map.py \
     --manual-map Data/IFLS_Workbench/manual_map.csv \
     --profiles-dir Data/IFLS_Workbench/device_profiles \
-    --max 20
+    --max 20 --jobs 4
 
 Notes:
 - Designed for GitHub Actions (has internet). Local use requires internet.
+- Manuals are fetched concurrently (--jobs workers, at most --per-host at a time per vendor site)
+  through one pooled session; parsing and profile writes still happen in manual_map.csv order.
+- Downloads go through a content-addressed cache (manual_cache.py, --cache-dir); unchanged manuals are
+  revalidated with conditional GETs. --cache-only runs fully offline from that cache; rows whose manual
+  is not cached are skipped without touching the profile or the manifest, and do not count towards --max.
+- A manifest (--manifest) records manual sha256, EXTRACTOR_VERSION and the written profile's sha256 per id.
+  Profiles whose manual, extractor and file are all unchanged are skipped (no parse, no write) and do
+  not count towards --max. Use --force to re-enrich everything.
+- The manifest doubles as a persistent work queue. Rows are worked in order: status "todo" first, then
+  never attempted, failed (due for retry), and finally done rows not re-checked for --recheck-days
+  (oldest check first). Failed rows back off exponentially (--retry-after-hours, doubling, max 30 days);
+  done rows checked recently are not even fetched. --max caps the attempts (successes and failures) per
+  run, and profiles + manifest are checkpointed every --checkpoint-every attempts, so an interrupted run
+  resumes where it stopped and nightly runs work through the list in batches.
+- Parsed manuals go into the evidence index (evidence_index.py, --evidence-index). A manual whose content is
+  already indexed with the same extractor settings is not parsed again; its labels come from the index.
+- PDFs are read through an mmap of the cached file. --pdf-max-pages 0 mines every page, --pdf-saturate N
+  stops once N pages in a row add no new label, and --pdf-jobs extracts pages in a process pool.
 """
-import argparse, csv, json, re
+import argparse, csv, hashlib, json, mmap, re, threading, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Union
+from urllib.parse import urlsplit
 
-import requests
+import instrument
+import json_io
+from manual_cache import DEFAULT_CACHE_DIR, CacheMiss, ManualCache
+
+if TYPE_CHECKING:
+    import requests
+
+# Bump whenever extract_controls_from_text / pdf_to_text / html_to_text change their output,
+# so the manifest invalidates every previously enriched profile.
+EXTRACTOR_VERSION = "1"
 
 def now_utc():
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
@@ -33,110 +64,423 @@ def now_utc():
 def is_pdf(url: str) -> bool:
     return url.lower().endswith(".pdf")
 
-def extract_controls_from_text(txt: str):
-    # Heuristics: capture common pedal UI nouns
-    patterns = [
-        r"\b([A-Z][A-Z0-9/\-\s]{2,32}\b)\s+(KNOB|SWITCH|FOOTSWITCH|BUTTON|LED|JACK|INPUT|OUTPUT)",
-        r"\b(KNOB|SWITCH|FOOTSWITCH|BUTTON|LED|JACK|INPUT|OUTPUT)\b[:\s\-]+([A-Z][A-Z0-9/\-\s]{2,32}\b)",
-        r"\b(LEVEL|TONE|ATTACK|SUSTAIN|RATE|DEPTH|MIX|BIT|SAMPLE RATE|MODE|TYPE|TIME|FEEDBACK|REPEAT)\b",
-    ]
-    found = set()
-    upper = txt.upper()
-    for pat in patterns:
-        for m in re.finditer(pat, upper):
+CONTROL_NOUNS = ("KNOB","SWITCH","FOOTSWITCH","BUTTON","LED","JACK","INPUT","OUTPUT")
+PARAM_NAMES = ("LEVEL","TONE","ATTACK","SUSTAIN","RATE","DEPTH","MIX","BIT","SAMPLE RATE","MODE","TYPE","TIME","FEEDBACK","REPEAT")
+_NOUNS = "|".join(CONTROL_NOUNS)
+# Heuristics: capture common pedal UI nouns ("<LABEL> KNOB", "KNOB: <LABEL>") and parameter names.
+_PATTERNS = (
+    re.compile(rf"\b([A-Z][A-Z0-9/\-\s]{{2,32}}\b)\s+({_NOUNS})"),
+    re.compile(rf"\b({_NOUNS})\b[:\s\-]+([A-Z][A-Z0-9/\-\s]{{2,32}}\b)"),
+    re.compile(rf"\b({'|'.join(PARAM_NAMES)})\b"),
+)
+
+def _label_hits(upper: str) -> List[Tuple[int, str]]:
+    """(offset, raw label) for every match of the label patterns in the uppercased text."""
+    hits = []
+    for pat in _PATTERNS:
+        for m in pat.finditer(upper):
             g = m.groups()
-            if len(g) == 2 and g[0] in ("KNOB","SWITCH","FOOTSWITCH","BUTTON","LED","JACK","INPUT","OUTPUT"):
-                label = g[1].strip()
-            elif len(g) == 2 and g[1] in ("KNOB","SWITCH","FOOTSWITCH","BUTTON","LED","JACK","INPUT","OUTPUT"):
-                label = g[0].strip()
-            else:
-                label = g[0].strip()
-            label = re.sub(r"\s+", " ", label).strip()
-            if 2 <= len(label) <= 40:
-                found.add(label)
-    # cleanup
+            i = 1 if len(g) == 2 and g[0] in CONTROL_NOUNS else 0
+            hits.append((m.start(i + 1), g[i].strip()))
+    return hits
+
+def label_offsets(txt: str) -> Dict[str, List[int]]:
+    """Control label -> sorted offsets in the uppercased text (the postings evidence_index.py stores)."""
+    found: Dict[str, List[int]] = {}
+    for offset, label in _label_hits(txt.upper()):
+        label = re.sub(r"\s+", " ", label).strip()
+        if 2 <= len(label) <= 40 and label not in CONTROL_NOUNS:
+            found.setdefault(label, []).append(offset)
+    for offsets in found.values():
+        offsets.sort()
+    return found
+
+def control_labels(txt: str) -> set:
+    return set(label_offsets(txt))
+
+def controls_from_labels(labels) -> List[Dict[str, str]]:
     out = []
-    for lab in sorted(found):
+    for lab in sorted(labels):
         # avoid pure nouns
-        if lab in ("KNOB","SWITCH","FOOTSWITCH","BUTTON","LED","JACK","INPUT","OUTPUT"):
+        if lab in CONTROL_NOUNS:
             continue
         out.append({"name_en": lab.title(), "type": "unknown", "notes_de": ""})
     return out[:40]
 
-def fetch_text(url: str):
-    r = requests.get(url, timeout=30)
+def extract_controls_from_text(txt: str):
+    return controls_from_labels(control_labels(txt))
+
+def make_session(pool_size: int = 10) -> "requests.Session":
+    import requests
+    from requests.adapters import HTTPAdapter
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+class HostLimiter:
+    """Hands out one semaphore per host so a single vendor site never gets more than `per_host` requests."""
+    def __init__(self, per_host: int):
+        self.per_host = max(1, per_host)
+        self._lock = threading.Lock()
+        self._sems = {}
+
+    def get(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = self._sems[host] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+def iter_fetched(urls, fetch, jobs: int = 4, per_host: int = 2):
+    """
+    Fetch urls on a thread pool and yield the futures in input order.
+    Only a small window runs ahead of the consumer, so stopping early (--max) wastes little.
+    """
+    limiter = HostLimiter(per_host)
+
+    def task(url):
+        with limiter.get(url), instrument.span("fetch", url=url) as s:
+            content, ct = fetch(url)
+            s["bytes"] = content.stat().st_size if isinstance(content, Path) else len(content)
+            return content, ct
+
+    ex = ThreadPoolExecutor(max_workers=max(1, jobs))
+    try:
+        it = iter(urls)
+        pending = deque(ex.submit(task, u) for _, u in zip(range(max(1, jobs) * 2), it))
+        while pending:
+            fut = pending.popleft()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append(ex.submit(task, nxt))
+            yield fut
+    finally:
+        ex.shutdown(wait=True, cancel_futures=True)
+
+def fetch_text(url: str, session=None):
+    if session is None:
+        import requests
+        session = requests
+    r = session.get(url, timeout=30)
     r.raise_for_status()
     ct = r.headers.get("content-type","").lower()
     return r.content, ct
 
-def pdf_to_text(pdf_bytes: bytes):
+def _open_pdf(src: Union[bytes, Path]):
+    """PdfReader over in-memory bytes, or over a read-only mmap of a (cached) file."""
     try:
         from pypdf import PdfReader
     except Exception as e:
         raise RuntimeError("Missing pypdf dependency. Add to requirements.txt") from e
-    import io
-    reader = PdfReader(io.BytesIO(pdf_bytes))
-    text = []
-    for page in reader.pages[:10]:  # cap to first 10 pages for speed
-        text.append(page.extract_text() or "")
-    return "\n".join(text)
-
-def html_to_text(html_bytes: bytes):
+    if isinstance(src, (bytes, bytearray)):
+        import io
+        return PdfReader(io.BytesIO(src)), None
+    with open(src, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return PdfReader(mm), mm
+
+_WORKER_PDF: Dict[str, Any] = {}
+
+def _extract_page(job: Tuple[str, int]) -> str:
+    # process-pool worker: keep the last opened file so consecutive pages do not re-parse the xref
+    path, i = job
+    if path not in _WORKER_PDF:
+        for _, mm in _WORKER_PDF.values():
+            mm.close()
+        _WORKER_PDF.clear()
+        _WORKER_PDF[path] = _open_pdf(Path(path))
+    return _WORKER_PDF[path][0].pages[i].extract_text() or ""
+
+def pdf_to_text(src: Union[bytes, Path], max_pages: int = 10, saturate: int = 0, pool=None, batch: int = 1):
+    """
+    Extract text from the first `max_pages` pages (0 = all).
+    saturate: stop once that many consecutive pages added no new control label (0 = never).
+    pool/batch: a ProcessPoolExecutor extracts `batch` pages at a time; only used for file paths,
+    since workers mmap the file themselves. Output does not depend on pool/batch.
+    """
+    reader, mm = _open_pdf(src)
+    try:
+        n = len(reader.pages)
+        if max_pages:
+            n = min(n, max_pages)
+        parallel = pool is not None and batch > 1 and isinstance(src, Path)
+        step = batch if parallel else 1
+        text: List[str] = []
+        seen: set = set()
+        dry = 0
+        for start in range(0, n, step):
+            idx = range(start, min(n, start + step))
+            if parallel:
+                pages = list(pool.map(_extract_page, [(str(src), i) for i in idx]))
+            else:
+                pages = [reader.pages[i].extract_text() or "" for i in idx]
+            for t in pages:
+                text.append(t)
+                if saturate:
+                    new = control_labels(t) - seen
+                    seen |= new
+                    dry = 0 if new else dry + 1
+                    if dry >= saturate:
+                        return "\n".join(text)
+        return "\n".join(text)
+    finally:
+        del reader
+        if mm is not None:
+            mm.close()
+
+def html_to_text(html_bytes: Union[bytes, Path]):
     try:
         from bs4 import BeautifulSoup
     except Exception as e:
         raise RuntimeError("Missing beautifulsoup4 dependency. Add to requirements.txt") from e
+    if isinstance(html_bytes, Path):
+        html_bytes = html_bytes.read_bytes()
     soup = BeautifulSoup(html_bytes, "html.parser")
     return soup.get_text("\n")
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--manual-map", type=Path, required=True)
-    ap.add_argument("--profiles-dir", type=Path, required=True)
-    ap.add_argument("--max", type=int, default=20)
-    args = ap.parse_args()
+def sha256_bytes(b: bytes) -> str:
+    return hashlib.sha256(b).hexdigest()
+
+def load_manifest(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("profiles", {})
+    except Exception:
+        return {}
+
+def save_manifest(path: Path, entries: dict) -> None:
+    json_io.write_text(path, json.dumps({"extractor_version": EXTRACTOR_VERSION, "profiles": entries},
+                                        ensure_ascii=False, indent=2, sort_keys=True)+"\n")
 
+def extractor_key(pdf_max_pages: int = 10, pdf_saturate: int = 0) -> str:
+    # PDF page settings change the extracted text, so they are part of the manifest's extractor version
+    if (pdf_max_pages, pdf_saturate) == (10, 0):
+        return EXTRACTOR_VERSION
+    return f"{EXTRACTOR_VERSION}+pdf{pdf_max_pages}s{pdf_saturate}"
+
+def is_unchanged(entry, url: str, manual_sha: str, profile_sha: str, extractor: str = EXTRACTOR_VERSION) -> bool:
+    return bool(entry) and entry.get("url") == url and entry.get("manual_sha256") == manual_sha \
+        and entry.get("extractor_version") == extractor and entry.get("output_sha256") == profile_sha
+
+RETRY_MAX_SECONDS = 30 * 86400
+DEFAULT_RECHECK_DAYS = 7
+# manual_map.csv status -> queue rank (anything else after these)
+STATUS_RANK = {"todo": 0}
+STATE_RANK = {"new": 0, "retry": 1, "stale": 2}
+
+def retry_delay(attempts: int, base: float) -> float:
+    """Backoff after the n-th consecutive failure: base, 2*base, 4*base, ... capped at 30 days."""
+    return min(base * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS)
+
+def queue_state(entry, url: str, profile_sha: str, extractor: str, now: float, recheck: float) -> str:
+    """Where a manual_map row stands: new, retry, backoff (failed, not due yet), fresh (done, checked recently) or stale."""
+    if not entry or entry.get("url") != url:
+        return "new"
+    if entry.get("state") == "failed":
+        return "backoff" if now < entry.get("next_attempt", 0) else "retry"
+    if recheck and now - entry.get("checked_at", 0) < recheck \
+            and entry.get("extractor_version") == extractor and entry.get("output_sha256") == profile_sha:
+        return "fresh"
+    return "stale"
+
+def load_rows(manual_map: Path, profiles_dir: Path) -> List[Dict[str, str]]:
+    """manual_map.csv rows that have a manual URL and an existing profile."""
     rows = []
-    with args.manual_map.open("r", encoding="utf-8") as f:
+    with manual_map.open("r", encoding="utf-8") as f:
         rd = csv.DictReader(f)
         for row in rd:
-            if row.get("manual_url","").strip():
+            if row.get("manual_url","").strip() and (profiles_dir / f"{row['id']}.json").exists():
                 rows.append(row)
+    return rows
 
-    processed = 0
-    for row in rows:
-        if processed >= args.max:
-            break
-        pid = row["id"]
-        url = row["manual_url"].strip()
-        prof_path = args.profiles_dir / f"{pid}.json"
-        if not prof_path.exists():
-            continue
+def build_queue(rows, manifest: dict, profiles_dir: Path, extractor: str, now: float, recheck: float,
+                force: bool = False):
+    """Due rows in work order plus a count of rows per queue state."""
+    states: Dict[str, int] = {}
+    due = []
+    for i, row in enumerate(rows):
+        entry = manifest.get(row["id"])
+        profile_sha = sha256_bytes((profiles_dir / f"{row['id']}.json").read_bytes())
+        state = "new" if force else queue_state(entry, row["manual_url"].strip(), profile_sha, extractor, now, recheck)
+        states[state] = states.get(state, 0) + 1
+        if state in STATE_RANK:
+            rank = (STATUS_RANK.get(row.get("status", "").strip().lower(), len(STATUS_RANK)),
+                    STATE_RANK[state], (entry or {}).get("last_attempt", 0), i)
+            due.append((rank, row))
+    return [row for _, row in sorted(due, key=lambda t: t[0])], states
 
-        prof = json.loads(prof_path.read_text(encoding="utf-8"))
-        try:
-            content, ct = fetch_text(url)
-            if is_pdf(url) or "pdf" in ct:
-                txt = pdf_to_text(content)
-            else:
-                txt = html_to_text(content)
-            controls = extract_controls_from_text(txt)
-        except Exception as e:
-            prof.setdefault("meta", {})["manual_enrich_error"] = str(e)
-            prof_path.write_text(json.dumps(prof, ensure_ascii=False, indent=2)+"\n", encoding="utf-8")
-            continue
+def mark_failed(entry, url: str, error: str, now: float, base_delay: float) -> dict:
+    entry = dict(entry or {})
+    attempts = entry.get("attempts", 0) + 1 if entry.get("state") == "failed" else 1
+    entry.update(url=url, state="failed", attempts=attempts, error=error, last_attempt=int(now),
+                 next_attempt=int(now + retry_delay(attempts, base_delay)))
+    return entry
+
+def mark_done(entry, now: float) -> dict:
+    entry = {k: v for k, v in (entry or {}).items() if k not in ("attempts", "error", "next_attempt")}
+    entry.update(state="done", checked_at=int(now))
+    return entry
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--manual-map", type=Path, required=True)
+    ap.add_argument("--profiles-dir", type=Path, required=True)
+    ap.add_argument("--max", type=int, default=20, help="max rows attempted (enriched or failed) per run")
+    ap.add_argument("--jobs", type=int, default=4, help="concurrent manual downloads (1 = serial)")
+    ap.add_argument("--per-host", type=int, default=2, help="max concurrent downloads per host")
+    ap.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    ap.add_argument("--no-cache", action="store_true", help="always download, do not read or write the manual cache")
+    ap.add_argument("--cache-only", action="store_true", help="offline: only use manuals already in the cache")
+    ap.add_argument("--cache-ttl", type=float, default=0, help="seconds a cached manual is trusted without revalidation")
+    ap.add_argument("--cache-max-mb", type=float, default=512, help="LRU size cap for the cache (0 = unlimited)")
+    ap.add_argument("--manifest", type=Path, default=None,
+                    help="incremental manifest (default: <profiles-dir>/../manual_enrich_manifest.json)")
+    ap.add_argument("--force", action="store_true", help="ignore the manifest and re-enrich every row")
+    ap.add_argument("--retry-after-hours", type=float, default=24,
+                    help="backoff after the first failure of a row; doubles per further failure")
+    ap.add_argument("--recheck-days", type=float, default=DEFAULT_RECHECK_DAYS,
+                    help="done rows are re-fetched/re-checked after this many days (0 = every run)")
+    ap.add_argument("--checkpoint-every", type=int, default=10,
+                    help="commit profiles and save the manifest after this many attempts")
+    ap.add_argument("--evidence-index", type=Path, default=None,
+                    help="label index to reuse and extend (default: <profiles-dir>/../evidence_index.sqlite)")
+    ap.add_argument("--no-evidence-index", action="store_true", help="always parse manuals, do not touch the index")
+    ap.add_argument("--pdf-max-pages", type=int, default=10, help="pages mined per PDF (0 = all)")
+    ap.add_argument("--pdf-saturate", type=int, default=0,
+                    help="stop a PDF after this many pages without a new control label (0 = off)")
+    ap.add_argument("--pdf-jobs", type=int, default=1, help="processes extracting PDF pages in parallel")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.start(args.trace, args.profile)
+    extractor = extractor_key(args.pdf_max_pages, args.pdf_saturate)
+    manifest_path = args.manifest or args.profiles_dir.parent / "manual_enrich_manifest.json"
+    manifest = load_manifest(manifest_path)
+
+    rows = load_rows(args.manual_map, args.profiles_dir)
+    index = None
+    if not args.no_evidence_index:
+        from evidence_index import EvidenceIndex, default_db_path
+        index = EvidenceIndex(args.evidence_index or default_db_path(args.profiles_dir))
+
+    cache = None
+    if not args.no_cache:
+        cache = ManualCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                            ttl=args.cache_ttl, offline=args.cache_only)
+    # an offline cache never touches the network, so requests is not even imported
+    session = None if cache and cache.offline else make_session(max(args.jobs, 1))
+    fetch = (lambda u: cache.fetch_path(u, session)) if cache else (lambda u: fetch_text(u, session))
+    now = time.time()
+    queue, states = build_queue(rows, manifest, args.profiles_dir, extractor, now,
+                                args.recheck_days * 86400, force=args.force)
+    pdf_pool = ProcessPoolExecutor(max_workers=args.pdf_jobs) if args.pdf_jobs > 1 else None
+    fetched = iter_fetched((r["manual_url"].strip() for r in queue),
+                           fetch, jobs=args.jobs, per_host=args.per_host)
+    processed = skipped = failed = missed = 0
+    # profile writes are staged and committed together (one sync) at each checkpoint, then the manifest is saved
+    staged: Dict[Path, str] = {}
+    with json_io.Batch() as batch:
+        def checkpoint():
+            with instrument.span("checkpoint", files=len(batch.staged)):
+                batch.commit()
+                save_manifest(manifest_path, manifest)
+
+        for row, fut in zip(queue, fetched):
+            attempts = processed + failed
+            if attempts >= args.max:
+                break
+            if attempts and args.checkpoint_every > 0 and attempts % args.checkpoint_every == 0 and batch.staged:
+                checkpoint()
+            pid = row["id"]
+            url = row["manual_url"].strip()
+            prof_path = args.profiles_dir / f"{pid}.json"
+
+            # a profile staged earlier in this run (same id listed twice) has not been renamed into place yet
+            raw = staged[prof_path].encode("utf-8") if prof_path in staged else prof_path.read_bytes()
+            prof = json.loads(raw.decode("utf-8"))
+            try:
+                # cached manuals come back as blobs/<sha256> paths, uncached ones as bytes
+                content, ct = fut.result()
+                manual_sha = content.name if isinstance(content, Path) else sha256_bytes(content)
+                if not args.force and is_unchanged(manifest.get(pid), url, manual_sha, sha256_bytes(raw), extractor):
+                    manifest[pid] = mark_done(manifest[pid], time.time())
+                    skipped += 1
+                    continue
+                kind = "pdf" if is_pdf(url) or "pdf" in ct else "html"
+                doc = index.find(manual_sha, extractor) if index else None
+                if doc is not None:
+                    with instrument.span("extract", id=pid, indexed=True) as s:
+                        controls = controls_from_labels(index.labels(doc))
+                        s["controls"] = len(controls)
+                    known = index.document(url)
+                    if not known or (known["sha256"], known["extractor"]) != (manual_sha, extractor):
+                        index.copy(url, "urls", kind, doc)
+                else:
+                    with instrument.span("parse", id=pid, url=url, kind=kind) as s:
+                        if kind == "pdf":
+                            txt = pdf_to_text(content, max_pages=args.pdf_max_pages, saturate=args.pdf_saturate,
+                                              pool=pdf_pool, batch=args.pdf_jobs)
+                        else:
+                            txt = html_to_text(content)
+                        s["chars"] = len(txt)
+                    with instrument.span("extract", id=pid) as s:
+                        labels = label_offsets(txt)
+                        controls = controls_from_labels(labels)
+                        s["controls"] = len(controls)
+                    if index:
+                        index.add(url, "urls", kind, manual_sha, extractor, txt, labels)
+                if index:
+                    index.link(pid, url, "manual_sources")
+            except CacheMiss:
+                # offline and never downloaded: not an attempt, the profile and its queue entry stay as they are
+                missed += 1
+                continue
+            except Exception as e:
+                prof.setdefault("meta", {})["manual_enrich_error"] = str(e)
+                staged[prof_path] = json_io.dumps(prof)+"\n"
+                batch.write(prof_path, staged[prof_path])
+                manifest[pid] = mark_failed(manifest.get(pid), url, str(e), time.time(),
+                                            args.retry_after_hours * 3600)
+                failed += 1
+                continue
 
-        # merge: keep existing controls if they look better
-        if len(controls) > len(prof.get("controls") or []):
-            prof["controls"] = controls
-        prof["manual_sources"] = list(dict.fromkeys((prof.get("manual_sources") or []) + [url]))
-        prof["enriched"] = True
-        prof.setdefault("meta", {})["manual_enriched_at_utc"] = now_utc()
+            # merge: keep existing controls if they look better
+            if len(controls) > len(prof.get("controls") or []):
+                prof["controls"] = controls
+            prof["manual_sources"] = list(dict.fromkeys((prof.get("manual_sources") or []) + [url]))
+            prof["enriched"] = True
+            prof.setdefault("meta", {})["manual_enriched_at_utc"] = now_utc()
 
-        prof_path.write_text(json.dumps(prof, ensure_ascii=False, indent=2)+"\n", encoding="utf-8")
-        processed += 1
+            out = staged[prof_path] = json_io.dumps(prof)+"\n"
+            with instrument.span("write", id=pid, bytes=len(out.encode("utf-8"))):
+                batch.write(prof_path, out)
+            manifest[pid] = mark_done({
+                "url": url,
+                "manual_sha256": manual_sha,
+                "extractor_version": extractor,
+                "output_sha256": sha256_bytes(out.encode("utf-8")),
+                "last_attempt": int(time.time()),
+            }, time.time())
+            processed += 1
 
-    print(f"Processed: {processed}")
+    fetched.close()
+    if session:
+        session.close()
+    if pdf_pool:
+        pdf_pool.shutdown()
+    if index:
+        index.close()
+    if cache:
+        cache.save()
+        print("Manual cache:", dict(cache.stats))
+        instrument.count("manual_cache", **cache.stats, hit_rate=cache.hit_rate())
+    instrument.count("enrich", processed=processed, skipped=skipped, failed=failed, missed=missed, queue=states)
+    save_manifest(manifest_path, manifest)
+    print("Queue:", ", ".join(f"{k} {v}" for k, v in sorted(states.items())))
+    print(f"Processed: {processed} (unchanged, skipped: {skipped}; failed: {failed}; not in cache: {missed})")
 
 if __name__ == "__main__":
     main()
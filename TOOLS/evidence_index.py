@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Inverted index of control labels over the evidence: Evidence/{manuals,video_transcripts,video_claims,web_sources}
+plus the manuals in the download cache (Evidence/manuals/.cache).
+
+Documents are mined once with the enrich label heuristics (enrich_from_manual_map.label_offsets) and
+stored in SQLite as postings (label -> document, offset, context). Queries then answer from indexes:
+  - candidates(device): labels found in the device's documents, ranked by how many documents mention them
+  - evidence(device, label): where a label occurs (document, offset, surrounding text)
+  - search(label): devices and documents mentioning a label
+
+- Updates are incremental: a file is only re-hashed when its mtime/size changed and only re-extracted when
+  its sha256 or the extractor settings changed; identical files (or a cached manual that is also in
+  Evidence/manuals) share one extraction.
+- Devices are linked to documents through their profiles (manual_sources, meta.*_sources paths and YouTube
+  URLs), manual_map.csv, video_claims "devices", and file names equal to a device id.
+- enrich_from_manual_map.py writes the manuals it parses into the same index and skips parsing manuals
+  that are already indexed.
+
+Usage:
+  python tools/evidence_index.py                                      # refresh
+  python tools/evidence_index.py --device m_vave_mini_universe        # candidate controls
+  python tools/evidence_index.py --device m_vave_mini_universe --label "SAMPLE RATE"
+  python tools/evidence_index.py --search RATE
+"""
+import argparse, csv, hashlib, json, re, sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import instrument
+from excel_to_json import slug_id
+from manual_cache import DEFAULT_CACHE_DIR, ManualCache
+from profile_catalog import ProfileCatalog
+
+INDEX_VERSION = 1
+
+# Evidence file suffix -> how its text is extracted
+KINDS = {".pdf": "pdf", ".html": "html", ".htm": "html", ".txt": "text", ".md": "text", ".json": "text"}
+CONTEXT_CHARS = 40
+_YOUTUBE_ID = re.compile(r"(?:youtu\.be/|[?&]v=)([\w-]{11})")
+
+def default_db_path(profiles_dir: Path) -> Path:
+    return profiles_dir.parent / "evidence_index.sqlite"
+
+def extract_text(src: Path, kind: str, pdf_max_pages: int = 10, pdf_saturate: int = 0) -> str:
+    if kind == "text":
+        return src.read_text(encoding="utf-8", errors="replace")
+    import enrich_from_manual_map as enrich
+    if kind == "pdf":
+        return enrich.pdf_to_text(src, max_pages=pdf_max_pages, saturate=pdf_saturate)
+    return enrich.html_to_text(src)
+
+def _context(text: str, offset: int) -> str:
+    return re.sub(r"\s+", " ", text[max(0, offset - CONTEXT_CHARS):offset + CONTEXT_CHARS]).strip()
+
+def _refs(value) -> Iterable[str]:
+    """Source strings in a profile's *_sources entry (a string, or a dict with path/url)."""
+    if isinstance(value, dict):
+        value = value.get("path") or value.get("url")
+    if isinstance(value, str) and value.strip():
+        yield value.strip()
+
+class EvidenceIndex:
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.db_path))
+        self.db.row_factory = sqlite3.Row
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        ver = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if ver != INDEX_VERSION:
+            for t in ("documents", "postings", "links"):
+                self.db.execute(f"DROP TABLE IF EXISTS {t}")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY,
+                source TEXT UNIQUE, collection TEXT, kind TEXT,
+                sha256 TEXT, mtime_ns INTEGER, size INTEGER, extractor TEXT, chars INTEGER, error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS documents_sha ON documents(sha256, extractor);
+            CREATE TABLE IF NOT EXISTS postings (term TEXT, doc_id INTEGER, offset INTEGER, context TEXT);
+            CREATE INDEX IF NOT EXISTS postings_term ON postings(term);
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings(doc_id);
+            CREATE TABLE IF NOT EXISTS links (device TEXT, source TEXT, via TEXT, PRIMARY KEY (device, source));
+            CREATE INDEX IF NOT EXISTS links_source ON links(source);
+        """)
+        self.db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self.db.commit()
+
+    # ---------- documents ----------
+    def document(self, source: str) -> Optional[sqlite3.Row]:
+        return self.db.execute("SELECT * FROM documents WHERE source=?", (source,)).fetchone()
+
+    def find(self, sha256: str, extractor: str) -> Optional[int]:
+        """doc_id of an indexed (error-free) document with this content and extractor, if any."""
+        r = self.db.execute("SELECT doc_id FROM documents WHERE sha256=? AND extractor=? AND error IS NULL LIMIT 1",
+                            (sha256, extractor)).fetchone()
+        return r["doc_id"] if r else None
+
+    def labels(self, doc_id: int) -> set:
+        return {r["term"] for r in self.db.execute("SELECT DISTINCT term FROM postings WHERE doc_id=?", (doc_id,))}
+
+    def _put(self, source: str, collection: str, kind: str, sha256: str, extractor: str,
+             mtime_ns: Optional[int], size: Optional[int], chars: Optional[int], error: Optional[str]) -> int:
+        old = self.document(source)
+        if old:
+            self.db.execute("DELETE FROM postings WHERE doc_id=?", (old["doc_id"],))
+            self.db.execute("UPDATE documents SET collection=?, kind=?, sha256=?, mtime_ns=?, size=?, extractor=?, "
+                            "chars=?, error=? WHERE doc_id=?",
+                            (collection, kind, sha256, mtime_ns, size, extractor, chars, error, old["doc_id"]))
+            return old["doc_id"]
+        return self.db.execute("INSERT INTO documents (source, collection, kind, sha256, mtime_ns, size, extractor, "
+                               "chars, error) VALUES (?,?,?,?,?,?,?,?,?)",
+                               (source, collection, kind, sha256, mtime_ns, size, extractor, chars, error)).lastrowid
+
+    def add(self, source: str, collection: str, kind: str, sha256: str, extractor: str, text: str,
+            labels: Optional[Dict[str, List[int]]] = None, mtime_ns: Optional[int] = None,
+            size: Optional[int] = None) -> int:
+        """(Re)index a document from its extracted text; labels are label_offsets(text) if the caller has them."""
+        if labels is None:
+            from enrich_from_manual_map import label_offsets
+            labels = label_offsets(text)
+        upper = text.upper()
+        # offsets point into the uppercased text; use the original for context unless upper() changed lengths
+        ctx = text if len(upper) == len(text) else upper
+        with self.db:
+            doc_id = self._put(source, collection, kind, sha256, extractor, mtime_ns, size, len(text), None)
+            self.db.executemany("INSERT INTO postings VALUES (?,?,?,?)",
+                                [(term, doc_id, o, _context(ctx, o)) for term, offs in labels.items() for o in offs])
+        return doc_id
+
+    def copy(self, source: str, collection: str, kind: str, from_doc: int, mtime_ns: Optional[int] = None,
+             size: Optional[int] = None) -> int:
+        """Index source as a duplicate of an already indexed document (same bytes, same extractor)."""
+        src = self.db.execute("SELECT * FROM documents WHERE doc_id=?", (from_doc,)).fetchone()
+        with self.db:
+            doc_id = self._put(source, collection, kind, src["sha256"], src["extractor"], mtime_ns, size,
+                               src["chars"], None)
+            self.db.execute("INSERT INTO postings SELECT term, ?, offset, context FROM postings WHERE doc_id=?",
+                            (doc_id, from_doc))
+        return doc_id
+
+    def add_error(self, source: str, collection: str, kind: str, sha256: str, extractor: str, error: str,
+                  mtime_ns: Optional[int] = None, size: Optional[int] = None) -> None:
+        """Remember a document that failed to extract, so it is only retried once it changes."""
+        with self.db:
+            self._put(source, collection, kind, sha256, extractor, mtime_ns, size, None, error)
+
+    def link(self, device: str, source: str, via: str) -> None:
+        self.db.execute("INSERT OR IGNORE INTO links VALUES (?,?,?)", (device, source, via))
+
+    # ---------- refresh ----------
+    def refresh(self, evidence_dir: Path, profiles_dir: Path, manual_map: Optional[Path] = None,
+                cache_dir: Optional[Path] = None, pdf_max_pages: int = 10, pdf_saturate: int = 0) -> Dict[str, int]:
+        """
+        Sync documents with evidence_dir and the manual cache, then rebuild the device links.
+        Returns counts of added/updated/reused/touched/removed/unchanged/failed documents and links.
+        Sources are stored relative to evidence_dir's parent ("Evidence/manuals/x.pdf"), as profiles cite them.
+        """
+        from enrich_from_manual_map import extractor_key, is_pdf
+        extractor = extractor_key(pdf_max_pages, pdf_saturate)
+        stats = dict.fromkeys(("added", "updated", "reused", "touched", "removed", "unchanged", "failed"), 0)
+        evidence_dir, root = Path(evidence_dir), Path(evidence_dir).parent
+        seen = set()
+
+        def index_one(source: str, collection: str, kind: str, path: Path, st, sha: Optional[str] = None):
+            old = self.document(source)
+            if old and old["extractor"] == extractor and (
+                    (sha is None and old["mtime_ns"] == st.st_mtime_ns and old["size"] == st.st_size)
+                    or (sha is not None and old["sha256"] == sha)):
+                stats["unchanged"] += 1
+                return
+            if sha is None:
+                sha = hashlib.sha256(path.read_bytes()).hexdigest()
+                if old and old["extractor"] == extractor and old["sha256"] == sha:
+                    with self.db:
+                        self.db.execute("UPDATE documents SET mtime_ns=?, size=? WHERE doc_id=?",
+                                        (st.st_mtime_ns, st.st_size, old["doc_id"]))
+                    stats["touched"] += 1
+                    return
+            same = self.find(sha, extractor)
+            if same is not None:
+                self.copy(source, collection, kind, same, st.st_mtime_ns, st.st_size)
+                stats["reused"] += 1
+                return
+            with instrument.span("evidence_extract", source=source, kind=kind) as s:
+                try:
+                    text = extract_text(path, kind, pdf_max_pages, pdf_saturate)
+                except Exception as e:
+                    self.add_error(source, collection, kind, sha, extractor, str(e), st.st_mtime_ns, st.st_size)
+                    stats["failed"] += 1
+                    return
+                s["chars"] = len(text)
+                self.add(source, collection, kind, sha, extractor, text, mtime_ns=st.st_mtime_ns, size=st.st_size)
+            stats["updated" if old else "added"] += 1
+
+        for p in sorted(evidence_dir.rglob("*")):
+            rel = p.relative_to(evidence_dir)
+            kind = KINDS.get(p.suffix.lower())
+            # hidden entries include manuals/.cache, which is indexed by URL below
+            if not kind or not p.is_file() or any(part.startswith(".") for part in rel.parts):
+                continue
+            source = p.relative_to(root).as_posix()
+            seen.add(source)
+            index_one(source, rel.parts[0] if len(rel.parts) > 1 else "", kind, p, p.stat())
+
+        map_rows = []
+        if manual_map and Path(manual_map).exists():
+            with Path(manual_map).open("r", encoding="utf-8") as f:
+                map_rows = [r for r in csv.DictReader(f) if (r.get("manual_url") or "").strip()]
+        keep_urls = {r["manual_url"].strip() for r in map_rows}
+        if cache_dir:
+            cache = ManualCache(cache_dir, offline=True)
+            for url, e in sorted(cache.index.items()):
+                blob = cache.blobs / e["sha256"]
+                if not blob.exists():
+                    continue
+                keep_urls.add(url)
+                kind = "pdf" if is_pdf(url) or "pdf" in (e.get("content_type") or "") else "html"
+                index_one(url, "urls", kind, blob, blob.stat(), sha=e["sha256"])
+
+        with self.db:
+            for r in self.db.execute("SELECT doc_id, source, collection FROM documents").fetchall():
+                if r["source"] in seen or (r["collection"] == "urls" and r["source"] in keep_urls):
+                    continue
+                self.db.execute("DELETE FROM postings WHERE doc_id=?", (r["doc_id"],))
+                self.db.execute("DELETE FROM documents WHERE doc_id=?", (r["doc_id"],))
+                stats["removed"] += 1
+            stats["links"] = self._relink(evidence_dir, profiles_dir, map_rows)
+        return stats
+
+    def _relink(self, evidence_dir: Path, profiles_dir: Path, map_rows: List[Dict[str, str]]) -> int:
+        ev = evidence_dir.name
+        sources = {r["source"] for r in self.db.execute("SELECT source FROM documents")}
+        self.db.execute("DELETE FROM links")
+
+        def link_ref(device: str, ref: str, via: str) -> None:
+            m = _YOUTUBE_ID.search(ref)
+            if m:  # a video: its transcript and claims, if we have them
+                for s in (f"{ev}/video_transcripts/{m.group(1)}.txt", f"{ev}/video_claims/{m.group(1)}.json"):
+                    self.link(device, s, via)
+            else:
+                self.link(device, ref, via)
+
+        cat = ProfileCatalog(profiles_dir)
+        cat.refresh()
+        devices = set()
+        for prof in cat.profiles():
+            device = prof.get("id")
+            if not device:
+                continue
+            devices.add(device)
+            meta = prof.get("meta") or {}
+            for ref in prof.get("manual_sources") or []:
+                for r in _refs(ref):
+                    link_ref(device, r, "manual_sources")
+            for key in ("manual_sources", "video_sources", "web_sources"):
+                for ref in meta.get(key) or []:
+                    for r in _refs(ref):
+                        link_ref(device, r, f"meta.{key}")
+        cat.close()
+        for row in map_rows:
+            self.link(row["id"], row["manual_url"].strip(), "manual_map")
+        for source in sorted(sources):
+            if not source.startswith(f"{ev}/"):
+                continue
+            stem = slug_id(Path(source).stem)
+            if stem in devices:
+                self.link(stem, source, "file_name")
+            if not source.startswith(f"{ev}/video_claims/"):
+                continue
+            # claims name their devices directly, or cite transcripts whose devices they share
+            try:
+                claims = json.loads((evidence_dir.parent / source).read_text(encoding="utf-8"))
+            except Exception:
+                continue
+            for device in claims.get("devices") or []:
+                self.link(device, source, "video_claims")
+                if claims.get("video_id"):
+                    self.link(device, f"{ev}/video_transcripts/{claims['video_id']}.txt", "video_claims")
+            for cited in claims.get("sources") or []:
+                for r in self.db.execute("SELECT device FROM links WHERE source=?", (cited,)).fetchall():
+                    self.link(r["device"], source, "video_claims")
+        return self.db.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+
+    # ---------- queries ----------
+    def candidates(self, device: str, limit: int = 40) -> List[Dict[str, Any]]:
+        """Labels in the device's documents: most documents first, then most occurrences, then name."""
+        cur = self.db.execute("""
+            SELECT p.term AS label, COUNT(DISTINCT p.doc_id) AS documents, COUNT(*) AS hits
+            FROM links l JOIN documents d ON d.source = l.source JOIN postings p ON p.doc_id = d.doc_id
+            WHERE l.device = ?
+            GROUP BY p.term ORDER BY documents DESC, hits DESC, p.term LIMIT ?""", (device, limit))
+        return [{"name_en": r["label"].title(), **dict(r)} for r in cur]
+
+    def evidence(self, device: str, label: str) -> List[Dict[str, Any]]:
+        cur = self.db.execute("""
+            SELECT d.source, p.offset, p.context
+            FROM links l JOIN documents d ON d.source = l.source JOIN postings p ON p.doc_id = d.doc_id
+            WHERE l.device = ? AND p.term = ? ORDER BY d.source, p.offset""", (device, label.upper()))
+        return [dict(r) for r in cur]
+
+    def search(self, label: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Devices (None for unlinked documents) and documents mentioning a label."""
+        cur = self.db.execute("""
+            SELECT l.device, d.source, COUNT(*) AS hits
+            FROM postings p JOIN documents d ON d.doc_id = p.doc_id LEFT JOIN links l ON l.source = d.source
+            WHERE p.term = ? GROUP BY l.device, d.source ORDER BY hits DESC, l.device, d.source LIMIT ?""",
+                              (label.upper(), limit))
+        return [dict(r) for r in cur]
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--evidence-dir", type=Path, default=Path("Evidence"))
+    ap.add_argument("--profiles-dir", type=Path, default=Path("Data/IFLS_Workbench/device_profiles"))
+    ap.add_argument("--manual-map", type=Path, default=None, help="default: <profiles-dir>/../manual_map.csv")
+    ap.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="manual download cache to index")
+    ap.add_argument("--db", type=Path, default=None, help="default: <profiles-dir>/../evidence_index.sqlite")
+    ap.add_argument("--pdf-max-pages", type=int, default=10, help="pages mined per PDF (0 = all); as in enrich")
+    ap.add_argument("--pdf-saturate", type=int, default=0, help="as in enrich_from_manual_map.py")
+    ap.add_argument("--no-refresh", action="store_true", help="query the index as it is")
+    ap.add_argument("--device", default=None, help="print candidate controls for this device id")
+    ap.add_argument("--label", default=None, help="with --device: print where this label occurs")
+    ap.add_argument("--search", default=None, help="print devices/documents mentioning this label")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.start(args.trace, args.profile)
+
+    idx = EvidenceIndex(args.db or default_db_path(args.profiles_dir))
+    if not args.no_refresh:
+        with instrument.span("evidence_refresh", evidence_dir=str(args.evidence_dir)) as s:
+            s.update(idx.refresh(args.evidence_dir, args.profiles_dir,
+                                 args.manual_map or args.profiles_dir.parent / "manual_map.csv",
+                                 args.cache_dir, args.pdf_max_pages, args.pdf_saturate))
+        print("Evidence index:", {k: v for k, v in s.items() if k != "evidence_dir"})
+    if args.device and args.label:
+        for r in idx.evidence(args.device, args.label):
+            print(f"{r['source']}\t{r['offset']}\t{r['context']}")
+    elif args.device:
+        for r in idx.candidates(args.device):
+            print(f"{r['name_en']}\t{r['documents']}\t{r['hits']}")
+    if args.search:
+        for r in idx.search(args.search):
+            print(f"{r['device'] or '-'}\t{r['source']}\t{r['hits']}")
+    idx.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,46 @@
 #!/usr/bin/env python3
+"""
+Convert the gear and patchbay workbooks into Data/IFLS_Workbench/gear.json and patchbay.json.
+
+- --gear-xlsx / --patchbay-xlsx take one or more workbooks or glob patterns. Every sheet of every
+  workbook is converted (--sheets narrows that down); sheets that are not a gear list / patchbay
+  matrix are skipped with a note.
+- One sheet is one task; with several sheets they run in a process pool (--jobs, default: all cores)
+  and the results are merged in input order:
+    gear:     items are unique by device (see gear_ids.identity_key); the first row wins, later
+              duplicates only fill its empty fields. Counts from different sheets add up (separate
+              inventories); a device listed twice on one sheet counts with the larger number.
+    patchbay: every sheet is its own patchbay, channel 1 of one is not channel 1 of another. The
+              first one fills outputs/inputs/index as before; with several, "patchbays" lists each
+              of them with its source. Only rows of the same device within one matrix are merged.
+- Gear ids are checked for collisions in the same pass (gear_ids.py): two different devices with the same
+  slug_id get <id>_2, ... and the assignment is kept in gear_id_map.json next to gear.json, so ids stay
+  stable between runs. Collisions and near-duplicate names are printed.
+- meta.source_files records every converted sheet ({"file", "sheet"} plus item/device counts).
+- Outputs carry their input hashes in meta; unchanged inputs are neither converted nor rewritten.
+
+Usage:
+  python tools/excel_to_json.py --gear-xlsx "SourceData/Geraeteliste.xlsx" --patchbay-xlsx "SourceData/Patchbay Übersicht.xlsx" --out-dir "Data/IFLS_Workbench"
+  python tools/excel_to_json.py --gear-xlsx "SourceData/Gear_*.xlsx" ... --sheets active   # one sheet per workbook
+"""
 import argparse
+import glob
+import hashlib
 import json
+import os
 import re
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-import pandas as pd
-import openpyxl
+import instrument
+import gear_ids
+import json_io
+from gear_ids import GearIds, default_id_map_path
+
+# pandas/openpyxl take most of the startup time; they are imported where a workbook is actually read.
+if TYPE_CHECKING:
+    import pandas as pd
 
 SCHEMA_VERSION = "0.1.0"
 
@@ -43,11 +76,85 @@ def normalize_mark(cell: Any) -> str:
         return "present"
     return "unknown"
 
-def write_json(path: Path, obj: Dict[str, Any]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(obj, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+# Marks that mean "this device is wired to this channel" (same set as IFLS_Patchbay_RoutingEngine.is_patched)
+PATCHED_MARKS = ("present", "left", "right", "sidechain_in")
+
+def build_channel_index(matrix: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Inverted index over one patchbay matrix, so consumers do not have to scan every device:
+      by_channel:    {"9": {"DBX 266XS": "left"}, ...}    channel -> patched devices and their mark
+      by_device:     {"DBX 266XS": {"mask": 768, "channels": [9, 10], "stereo_pairs": [[9, 10]]}}
+                     mask has bit (ch - 1) set for every patched channel
+      free_channels: channels no device is patched to
+    """
+    by_channel: Dict[str, Dict[str, str]] = {str(ch): {} for ch in matrix.get("channels", [])}
+    by_device: Dict[str, Dict[str, Any]] = {}
+    for dev in matrix.get("devices", []):
+        name, m = dev["name"], dev["map"]
+        chans = sorted(int(ch) for ch, mark in m.items() if mark in PATCHED_MARKS)
+        mask = 0
+        for ch in chans:
+            mask |= 1 << (ch - 1)
+            by_channel.setdefault(str(ch), {})[name] = m[str(ch)]
+        pairs = [[ch, ch + 1] for ch in chans if m.get(str(ch)) == "left" and m.get(str(ch + 1)) == "right"]
+        by_device[name] = {"mask": mask, "channels": chans, "stereo_pairs": pairs}
+    free = [int(ch) for ch, devs in by_channel.items() if not devs]
+    return {"by_channel": by_channel, "by_device": by_device, "free_channels": sorted(free)}
 
-def build_meta(*source_files: str) -> Dict[str, Any]:
+def write_json(path: Path, obj: Dict[str, Any]) -> None:
+    json_io.write_json(path, obj)
+
+def write_ndjson(path: Path, meta: Dict[str, Any], items: List[Dict[str, Any]]) -> None:
+    """Line-delimited variant for streaming consumers: first line {"meta": ...}, then one item per line."""
+    with json_io.atomic_open(path) as f:
+        f.write(json.dumps({"meta": meta}, ensure_ascii=False) + "\n")
+        for it in items:
+            f.write(json.dumps(it, ensure_ascii=False) + "\n")
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+def write_json_if_changed(path: Path, obj: Dict[str, Any]) -> bool:
+    """Write obj unless the file already holds the same data apart from meta.generated_at_utc."""
+    old = _read_json(path)
+    if old is not None:
+        strip = lambda d: {**d, "meta": {k: v for k, v in (d.get("meta") or {}).items() if k != "generated_at_utc"}}
+        if strip(old) == strip(obj):
+            return False
+    write_json(path, obj)
+    return True
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+# Any edit to this converter, or to the modules that decide what it writes (id assignment in gear_ids,
+# serialization in json_io), invalidates previously generated outputs.
+CONVERTER_MODULES = (Path(__file__), Path(gear_ids.__file__), Path(json_io.__file__))
+CONVERTER_SHA256 = hashlib.sha256("".join(file_sha256(p) for p in CONVERTER_MODULES).encode()).hexdigest()
+
+def source_labels(sources: List[Path]) -> List[str]:
+    # file names, unless two inputs share one (globs over several directories): then the full paths
+    names = [p.name for p in sources]
+    return names if len(set(names)) == len(names) else [p.as_posix() for p in sources]
+
+def cache_key(*sources: Path) -> Dict[str, Any]:
+    return {"source_sha256": {label: file_sha256(p) for label, p in zip(source_labels(list(sources)), sources)},
+            "converter_sha256": CONVERTER_SHA256}
+
+def is_up_to_date(out_path: Path, key: Dict[str, Any]) -> bool:
+    """True if out_path was generated from exactly these inputs by this converter version."""
+    old = _read_json(out_path)
+    meta = (old or {}).get("meta") or {}
+    return meta.get("schema_version") == SCHEMA_VERSION and all(meta.get(k) == v for k, v in key.items())
+
+def build_meta(*source_files: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "schema_version": SCHEMA_VERSION,
         "generated_at_utc": utc_now_iso(),
@@ -68,60 +175,106 @@ GEAR_COLUMNS = [
     "Besonderheiten / Technische Daten",
 ]
 
-def convert_gear_xlsx(path: Path) -> Dict[str, Any]:
-    df = pd.read_excel(path)
+GEAR_FIELDS = [
+    # (json key, source column) in output order; "count" is filled from "Anzahl" separately
+    ("main_category", "Hauptkategorie"),
+    ("sub_category", "Unterkategorie"),
+    ("category_type", "Kategorie-Typ"),
+    ("manufacturer", "Hersteller"),
+    ("model", "Modell"),
+    ("io_text", "Ein-/Ausgänge"),
+    ("controls_text", "Parameter/Regler"),
+    ("power_text", "Strom/Info"),
+    ("notes_text", "Notes/Highlights"),
+    ("tech_text", "Besonderheiten / Technische Daten"),
+]
+
+def _text_col(col: "pd.Series") -> "pd.Series":
+    # column-wise str(v or "").strip(); empty cells become "" rather than "nan"
+    col = col.astype(object).where(col.notna(), "")
+    col = col.where(col.astype(bool), "")
+    return col.astype(str).str.strip()
+
+def slug_id_col(*cols: "pd.Series") -> "pd.Series":
+    """Vectorized slug_id over already stripped columns (empty parts vanish in the '_' collapse)."""
+    s = cols[0]
+    for c in cols[1:]:
+        s = s + "_" + c
+    s = s.str.lower().str.replace(r"[^a-z0-9]+", "_", regex=True).str.strip("_")
+    return s.where(s != "", "item")
+
+def _source(path: Path, sheet: Optional[str]) -> Dict[str, Any]:
+    return {"file": path.name, "sheet": sheet} if sheet is not None else {"file": path.name}
+
+def _where(path: Path, sheet: Optional[str]) -> str:
+    return path.name if sheet is None else f"{path.name} [{sheet}]"
+
+def convert_gear_xlsx(path: Path, sheet: Optional[str] = None) -> Dict[str, Any]:
+    """Gear list on one sheet (default: the first one)."""
+    import pandas as pd
+    df = pd.read_excel(path, sheet_name=0 if sheet is None else sheet)
     missing = [c for c in GEAR_COLUMNS if c not in df.columns]
     if missing:
-        raise SystemExit(f"[gear] Missing columns in {path.name}: {missing}")
-
-    gear: List[Dict[str, Any]] = []
-    for _, row in df.iterrows():
-        manufacturer = str(row.get("Hersteller", "") or "").strip()
-        model = str(row.get("Modell", "") or "").strip()
-
-        item = {
-            "id": slug_id(manufacturer, model),
-            "main_category": str(row.get("Hauptkategorie", "") or "").strip(),
-            "sub_category": str(row.get("Unterkategorie", "") or "").strip(),
-            "category_type": str(row.get("Kategorie-Typ", "") or "").strip(),
-            "manufacturer": manufacturer,
-            "model": model,
-            "count": int(row.get("Anzahl", 0) or 0),
-            "io_text": str(row.get("Ein-/Ausgänge", "") or "").strip(),
-            "controls_text": str(row.get("Parameter/Regler", "") or "").strip(),
-            "power_text": str(row.get("Strom/Info", "") or "").strip(),
-            "notes_text": str(row.get("Notes/Highlights", "") or "").strip(),
-            "tech_text": str(row.get("Besonderheiten / Technische Daten", "") or "").strip(),
-            "tags": [],
-        }
-        if item["manufacturer"] or item["model"] or item["main_category"]:
-            gear.append(item)
-
-    return {"meta": build_meta(path.name), "gear": gear}
+        raise SystemExit(f"[gear] Missing columns in {_where(path, sheet)}: {missing}")
+
+    cols = {key: _text_col(df[src]) for key, src in GEAR_FIELDS}
+    cols["id"] = slug_id_col(cols["manufacturer"], cols["model"])
+    cols["count"] = pd.to_numeric(df["Anzahl"].where(df["Anzahl"].astype(bool), 0)).fillna(0).astype(int)
+    keep = (cols["manufacturer"] != "") | (cols["model"] != "") | (cols["main_category"] != "")
+
+    # zip of plain lists instead of DataFrame.to_dict("records"): same dicts, native ints, far fewer boxing calls
+    keys = ["id"] + [k for k, _ in GEAR_FIELDS[:5]] + ["count"] + [k for k, _ in GEAR_FIELDS[5:]]
+    values = [cols[k][keep].tolist() for k in keys]
+    gear: List[Dict[str, Any]] = [dict(zip(keys, row), tags=[]) for row in zip(*values)]
+    return {"meta": build_meta(_source(path, sheet)), "gear": gear}
+
 
+Grid = List[List[Any]]
+
+def load_grid(path: Path, sheet: Optional[str] = None) -> Grid:
+    """
+    Read one sheet (default: the active one) once (read_only + values_only) into a 2-D list of cell values.
+    Rows are padded to the same width; grid[r-1][c-1] is the value of cell (r, c).
+    The sheet's stored <dimension> is ignored: tools that write it stale would otherwise cut the grid short.
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.active if sheet is None else wb[sheet]
+        ws.reset_dimensions()
+        rows = [list(r) for r in ws.iter_rows(values_only=True)]
+    finally:
+        wb.close()
+    width = max((len(r) for r in rows), default=0)
+    for r in rows:
+        r.extend([None] * (width - len(r)))
+    return rows
+
+def _cell(grid: Grid, r: int, c: int) -> Any:
+    # 1-based like openpyxl; anything outside the used range is empty
+    if 1 <= r <= len(grid) and 1 <= c <= len(grid[r - 1]):
+        return grid[r - 1][c - 1]
+    return None
 
 def _cell_str(v: Any) -> str:
     if v is None:
         return ""
     return str(v).strip()
 
-def _is_blank_row(ws, r: int, c1: int = 1, c2: int = 2) -> bool:
+def _is_blank_row(grid: Grid, r: int, c1: int = 1, c2: int = 2) -> bool:
     # If first two relevant cells are empty => blank separator row for our matrices
-    return _cell_str(ws.cell(r, c1).value) == "" and _cell_str(ws.cell(r, c2).value) == ""
+    return _cell_str(_cell(grid, r, c1)) == "" and _cell_str(_cell(grid, r, c2)) == ""
 
-def find_row_with_prefix(ws, col: int, prefixes: List[str]) -> Optional[int]:
+def find_row_with_prefix(grid: Grid, col: int, prefixes: List[str]) -> Optional[int]:
     """Find first row where cell(row, col) starts with any prefix (case-insensitive)."""
-    pref = [p.strip().lower() for p in prefixes]
-    for r in range(1, ws.max_row + 1):
-        s = _cell_str(ws.cell(r, col).value).lower()
-        if not s:
-            continue
-        for p in pref:
-            if s.startswith(p):
-                return r
+    pref = tuple(p.strip().lower() for p in prefixes)
+    for r, row in enumerate(grid, start=1):
+        s = _cell_str(row[col - 1] if col <= len(row) else None).lower()
+        if s and s.startswith(pref):
+            return r
     return None
 
-def parse_wide_matrix(ws, header_row: int, name_col: int = 1, chan_start_col: int = 2) -> Tuple[Dict[str, Any], int]:
+def parse_wide_matrix(grid: Grid, header_row: int, name_col: int = 1, chan_start_col: int = 2) -> Tuple[Dict[str, Any], int]:
     """
     Wide matrix layout (your current Patchbay Übersicht.xlsx):
       Row header_row:  [<matrix title in A>] [1] [2] [3] ...
@@ -131,9 +284,8 @@ def parse_wide_matrix(ws, header_row: int, name_col: int = 1, chan_start_col: in
     Returns: (matrix_dict, last_row_used)
     """
     channels: List[int] = []
-    c = chan_start_col
-    while c <= ws.max_column:
-        s = _cell_str(ws.cell(header_row, c).value)
+    for v in grid[header_row - 1][chan_start_col - 1:]:
+        s = _cell_str(v)
         if s == "":
             break
         try:
@@ -141,24 +293,22 @@ def parse_wide_matrix(ws, header_row: int, name_col: int = 1, chan_start_col: in
         except Exception:
             break
         channels.append(ch)
-        c += 1
 
     if not channels:
         raise SystemExit(f"[patchbay] Wide matrix at row {header_row}: no channel numbers found (starting col {chan_start_col})")
 
     devices: List[Dict[str, Any]] = []
     r = header_row + 1
-    while r <= ws.max_row:
-        if _is_blank_row(ws, r, name_col, chan_start_col):
+    while r <= len(grid):
+        if _is_blank_row(grid, r, name_col, chan_start_col):
             break
-        dev_name = _cell_str(ws.cell(r, name_col).value)
+        dev_name = _cell_str(_cell(grid, r, name_col))
         if dev_name == "":
             break
-        m: Dict[str, str] = {}
-        for idx, ch in enumerate(channels):
-            v = ws.cell(r, chan_start_col + idx).value
-            m[str(ch)] = normalize_mark(v)
-        devices.append({"name": dev_name, "map": m})
+        row = grid[r - 1]
+        marks = row[chan_start_col - 1:chan_start_col - 1 + len(channels)]
+        marks += [None] * (len(channels) - len(marks))
+        devices.append({"name": dev_name, "map": {str(ch): normalize_mark(v) for ch, v in zip(channels, marks)}})
         r += 1
 
     if not devices:
@@ -167,34 +317,26 @@ def parse_wide_matrix(ws, header_row: int, name_col: int = 1, chan_start_col: in
     return {"channels": channels, "devices": devices}, (r - 1)
 
 
-def find_matrix_header(ws) -> Optional[Tuple[int, int]]:
-    target = "kanal"
-    for r in range(1, ws.max_row + 1):
-        for c in range(1, ws.max_column + 1):
-            v = ws.cell(r, c).value
-            if v is None:
-                continue
-            s = str(v).strip().lower()
-            if s.startswith(target):
+def find_matrix_header(grid: Grid, start_row: int = 1) -> Optional[Tuple[int, int]]:
+    """First (row, col) at or below start_row whose cell text starts with 'Kanal' (case-insensitive)."""
+    for r in range(start_row, len(grid) + 1):
+        for c, v in enumerate(grid[r - 1], start=1):
+            if v is not None and str(v).strip().lower().startswith("kanal"):
                 return (r, c)
     return None
 
-def read_device_headers(ws, header_row: int, start_col: int) -> List[Tuple[str, int]]:
+def read_device_headers(grid: Grid, header_row: int, start_col: int) -> List[Tuple[str, int]]:
     devices = []
-    c = start_col + 1
-    while c <= ws.max_column:
-        name = ws.cell(header_row, c).value
+    for c, name in enumerate(grid[header_row - 1][start_col:], start=start_col + 1):
         if name is None or str(name).strip() == "":
             break
         devices.append((str(name).strip(), c))
-        c += 1
     return devices
 
-def read_channels(ws, start_row: int, chan_col: int) -> List[int]:
+def read_channels(grid: Grid, start_row: int, chan_col: int) -> List[int]:
     channels = []
-    r = start_row
-    while r <= ws.max_row:
-        v = ws.cell(r, chan_col).value
+    for row in grid[start_row - 1:]:
+        v = row[chan_col - 1]
         if v is None or str(v).strip() == "":
             break
         try:
@@ -202,12 +344,11 @@ def read_channels(ws, start_row: int, chan_col: int) -> List[int]:
         except Exception:
             break
         channels.append(ch)
-        r += 1
     return channels
 
-def convert_patchbay_xlsx(path: Path) -> Dict[str, Any]:
+def convert_patchbay_xlsx(path: Path, sheet: Optional[str] = None) -> Dict[str, Any]:
     """
-    Supports TWO layouts:
+    Patchbay matrices on one sheet (default: the active one). Supports TWO layouts:
 
     (A) Wide matrix (your current file):
       Row 1: "Output Kanal Patchbay ..." + channel numbers across columns
@@ -217,92 +358,288 @@ def convert_patchbay_xlsx(path: Path) -> Dict[str, Any]:
     (B) Legacy tall matrix:
       Row:   "Kanal" | <Device 1> | <Device 2> | ...
       Below: channel numbers down the Kanal column; marks are in device columns.
+
+    The sheet is read once into an in-memory grid (see load_grid); all detection runs on that.
     """
-    wb = openpyxl.load_workbook(path, data_only=True)
-    ws = wb.active
+    grid = load_grid(path, sheet)
 
     def parse_matrix_from(header_row: int, chan_col: int) -> Tuple[Dict[str, Any], int]:
-        devices = read_device_headers(ws, header_row, chan_col)
+        devices = read_device_headers(grid, header_row, chan_col)
         if not devices:
-            raise SystemExit(f"[patchbay] No device columns found on row {header_row} in {path.name}")
+            raise SystemExit(f"[patchbay] No device columns found on row {header_row} in {_where(path, sheet)}")
 
         first_chan_row = header_row + 1
-        channels = read_channels(ws, first_chan_row, chan_col)
+        channels = read_channels(grid, first_chan_row, chan_col)
         if not channels:
-            raise SystemExit(f"[patchbay] No channels found under 'Kanal' at row {header_row} in {path.name}")
+            raise SystemExit(f"[patchbay] No channels found under 'Kanal' at row {header_row} in {_where(path, sheet)}")
 
+        rows = grid[first_chan_row - 1:first_chan_row - 1 + len(channels)]
         dev_objs = []
         for dev_name, dev_col in devices:
-            m: Dict[str, str] = {}
-            for idx, ch in enumerate(channels):
-                r = first_chan_row + idx
-                v = ws.cell(r, dev_col).value
-                m[str(ch)] = normalize_mark(v)
+            m = {str(ch): normalize_mark(row[dev_col - 1]) for ch, row in zip(channels, rows)}
             dev_objs.append({"name": dev_name, "map": m})
 
         matrix = {"channels": channels, "devices": dev_objs}
         last_row = first_chan_row + len(channels) - 1
         return matrix, last_row
 
-    data: Dict[str, Any] = {"meta": build_meta(path.name)}
+    data: Dict[str, Any] = {"meta": build_meta(_source(path, sheet))}
 
     # Prefer wide matrices if present (matches your current spreadsheet)
-    out_row = find_row_with_prefix(ws, 1, ["output kanal patchbay"])
-    in_row = find_row_with_prefix(ws, 1, ["input kanal patchbay"])
+    out_row = find_row_with_prefix(grid, 1, ["output kanal patchbay"])
+    in_row = find_row_with_prefix(grid, 1, ["input kanal patchbay"])
 
     if out_row:
-        outputs, _ = parse_wide_matrix(ws, out_row, name_col=1, chan_start_col=2)
+        outputs, _ = parse_wide_matrix(grid, out_row, name_col=1, chan_start_col=2)
         data["outputs"] = outputs
     if in_row:
-        inputs, _ = parse_wide_matrix(ws, in_row, name_col=1, chan_start_col=2)
+        inputs, _ = parse_wide_matrix(grid, in_row, name_col=1, chan_start_col=2)
         data["inputs"] = inputs
 
     # Fallback to legacy tall matrices if wide format not found
     if "outputs" not in data:
         # 1) Outputs (top)
-        pos_out = find_matrix_header(ws)
+        pos_out = find_matrix_header(grid)
         if not pos_out:
-            raise SystemExit(f"[patchbay] Could not find wide matrix OR legacy header 'Kanal' in {path.name}")
+            raise SystemExit(f"[patchbay] Could not find wide matrix OR legacy header 'Kanal' in {_where(path, sheet)}")
 
         out_header_row, out_chan_col = pos_out
         outputs, out_last_row = parse_matrix_from(out_header_row, out_chan_col)
         data["outputs"] = outputs
 
         # 2) Inputs (bottom) — search for the next "Kanal" header BELOW outputs
-        pos_in: Optional[Tuple[int, int]] = None
-        for r in range(out_last_row + 1, ws.max_row + 1):
-            for c in range(1, ws.max_column + 1):
-                v = ws.cell(r, c).value
-                if v is None:
-                    continue
-                s = str(v).strip().lower()
-                if s.startswith("kanal"):
-                    pos_in = (r, c)
-                    break
-            if pos_in:
-                break
-
+        pos_in = find_matrix_header(grid, out_last_row + 1)
         if pos_in:
             in_header_row, in_chan_col = pos_in
             inputs, _ = parse_matrix_from(in_header_row, in_chan_col)
             data["inputs"] = inputs
+
+    data["index"] = {k: build_channel_index(data[k]) for k in ("outputs", "inputs") if k in data}
+    return data
+
+# ---------- several workbooks / sheets ----------
+def expand_sources(specs: List[Path]) -> List[Path]:
+    """Workbook paths and glob patterns (quoted, so the shell leaves them alone) -> paths, in order, without repeats."""
+    out: List[Path] = []
+    for spec in specs:
+        pattern = str(spec)
+        if any(c in pattern for c in "*?["):
+            matches = [Path(m) for m in sorted(glob.glob(pattern, recursive=True))]
+            if not matches:
+                raise SystemExit(f"No workbook matches {pattern}")
+        else:
+            matches = [spec]
+        out.extend(m for m in matches if m not in out)
+    return out
+
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+def sheet_names(path: Path) -> Tuple[List[str], int]:
+    """
+    Worksheet names in workbook order and the index of the active one (the first worksheet if the active tab
+    is a chartsheet), read from xl/workbook.xml and its relationships without openpyxl. Chartsheets and other
+    sheets without cells are left out: there is nothing to convert on them.
+    """
+    import zipfile
+    from xml.etree import ElementTree as ET
+    with zipfile.ZipFile(path) as z:
+        root = ET.fromstring(z.read("xl/workbook.xml"))
+        try:
+            rels = ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+        except KeyError:
+            rels = None
+    kinds = {} if rels is None else {el.get("Id"): el.get("Type", "").rsplit("/", 1)[-1] for el in rels}
+    tabs = [(el.get("name"), kinds.get(el.get(f"{{{_REL_NS}}}id"), "worksheet"))
+            for el in root.iter() if el.tag.rsplit("}", 1)[-1] == "sheet"]
+    view = next((el for el in root.iter() if el.tag.rsplit("}", 1)[-1] == "workbookView"), None)
+    active = int(view.get("activeTab", 0)) if view is not None else 0
+    names = [name for name, kind in tabs if kind == "worksheet"]
+    active_name = tabs[min(active, len(tabs) - 1)][0] if tabs else None
+    return names, names.index(active_name) if active_name in names else 0
+
+def select_sheets(path: Path, sheets: str) -> List[str]:
+    """--sheets: "all", "active" or a comma list of sheet names (workbooks without them contribute nothing)."""
+    names, active = sheet_names(path)
+    if sheets == "all":
+        return names
+    if sheets == "active":
+        return names[active:active + 1]
+    wanted = [s.strip() for s in sheets.split(",") if s.strip()]
+    return [n for n in names if n in wanted]
+
+def _convert_sheet(task: Tuple[Any, Path, str, str]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    # pool worker: (data, None), or (None, reason) for a sheet the converter does not recognize
+    convert, path, sheet, label = task
+    try:
+        data = convert(path, sheet)
+    except SystemExit as e:
+        return None, str(e)
+    except Exception as e:
+        # not a layout question but a broken sheet (or a bug): stop, and say which sheet it was
+        raise RuntimeError(f"{label} [{sheet}]: {type(e).__name__}: {e}") from e
+    data["meta"]["source_files"][0]["file"] = label
+    return data, None
+
+def merge_gear(parts: List[Dict[str, Any]], ids: Optional[GearIds] = None) -> Dict[str, Any]:
+    """
+    One gear list from several converted sheets, one item per device in first-seen order, with ids
+    from ids (default: a fresh, unsaved GearIds). The first occurrence wins; duplicates only fill
+    fields it left empty. Each sheet is a separate inventory, so counts add up across sheets; a
+    device listed twice on the same sheet is one entry and counts with the larger number.
+    """
+    ids = ids if ids is not None else GearIds()
+    merged: Dict[str, Dict[str, Any]] = {}
+    totals: Dict[str, int] = {}
+    sources = []
+    for part in parts:
+        dupes = 0
+        counts: Dict[str, int] = {}  # this sheet's count per id
+        for it in part["gear"]:
+            it["id"], duplicate = ids.resolve(it["id"], it["manufacturer"], it["model"])
+            counts[it["id"]] = max(counts.get(it["id"], 0), it["count"])
+            first = merged.setdefault(it["id"], it)
+            if not duplicate:
+                continue
+            dupes += 1
+            for k, v in it.items():
+                if k != "count" and v and not first.get(k):
+                    first[k] = v
+        for pid, n in counts.items():
+            totals[pid] = totals.get(pid, 0) + n
+        sources.append({**part["meta"]["source_files"][0], "items": len(part["gear"]), "duplicates": dupes})
+    for pid, it in merged.items():
+        it["count"] = totals[pid]
+    for line in ids.report():
+        print(line)
+    return {"meta": build_meta(*sources), "gear": list(merged.values())}
+
+def merge_device_rows(matrix: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One row per device name within a single matrix (a device listed twice on the same sheet): a patched
+    mark beats an unpatched one, otherwise the first row wins. Matrices of different sheets are never
+    merged; their channel numbers belong to different patchbays.
+    """
+    maps: Dict[str, Dict[str, str]] = {}
+    for dev in matrix["devices"]:
+        cur = maps.get(dev["name"])
+        if cur is None:
+            maps[dev["name"]] = dict(dev["map"])
+            continue
+        for ch, mark in dev["map"].items():
+            if cur.get(ch) not in PATCHED_MARKS and mark in PATCHED_MARKS:
+                cur[ch] = mark
+    if len(maps) == len(matrix["devices"]):
+        return matrix
+    return {"channels": matrix["channels"], "devices": [{"name": n, "map": m} for n, m in maps.items()]}
+
+def merge_patchbay(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Each converted sheet stays its own patchbay. The first one is the top-level outputs/inputs/index
+    (what single-patchbay consumers read); with several, "patchbays" holds all of them in input order,
+    each with its source, matrices and index.
+    """
+    sources, patchbays = [], []
+    for part in parts:
+        source = part["meta"]["source_files"][0]
+        pb: Dict[str, Any] = {"source": source}
+        for k in ("outputs", "inputs"):
+            if k in part:
+                pb[k] = merge_device_rows(part[k])
+        pb["index"] = {k: build_channel_index(pb[k]) for k in ("outputs", "inputs") if k in pb}
+        patchbays.append(pb)
+        sources.append({**source, **{k: len(pb[k]["devices"]) for k in ("outputs", "inputs") if k in pb}})
+    data: Dict[str, Any] = {"meta": build_meta(*sources)}
+    data.update((k, v) for k, v in patchbays[0].items() if k != "source")
+    if len(patchbays) > 1:
+        data["patchbays"] = patchbays
+    return data
+
+MERGE = {convert_gear_xlsx: merge_gear, convert_patchbay_xlsx: merge_patchbay}
+
+def convert_sources(convert, sources: List[Path], sheets: str = "all", jobs: int = 0,
+                    ids: Optional[GearIds] = None) -> Dict[str, Any]:
+    """
+    Run convert over every selected sheet of every source (a process pool of up to `jobs` workers,
+    0 = one per core, when there is more than one sheet) and merge the results in input order.
+    With sheets="all", sheets the converter rejects are skipped; otherwise every selected sheet must convert.
+    ids is the gear id map for merge_gear.
+    """
+    labels = source_labels(sources)
+    tasks = [(convert, p, sheet, label) for p, label in zip(sources, labels) for sheet in select_sheets(p, sheets)]
+    if not tasks:
+        raise SystemExit(f"No sheet matching --sheets {sheets!r} in {', '.join(labels)}")
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor  # only paid for when there is more than one sheet
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            results = list(ex.map(_convert_sheet, tasks))
+    else:
+        results = [_convert_sheet(t) for t in tasks]
+    errors = [err for _, err in results if err]
+    if not any(data for data, _ in results) or (errors and sheets != "all"):
+        raise SystemExit("\n".join(errors))
+    for err in errors:
+        print("Skipped sheet:", err)
+    parts = [data for data, _ in results if data]
+    return MERGE[convert](parts) if ids is None else MERGE[convert](parts, ids)
+
+def convert_output(convert, src, out_path: Path, force: bool = False, sheets: str = "all", jobs: int = 0,
+                   id_map: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """
+    Convert src (one workbook or a list of them) into out_path and return the data, or None if
+    out_path is already up to date. Outputs carry their input hashes in meta; unchanged inputs
+    are neither converted nor rewritten. For gear, id_map is the persisted GearIds map; it is
+    hashed like an input and updated before the output is written.
+    """
+    sources = list(src) if isinstance(src, (list, tuple)) else [src]
+    names = ", ".join(p.name for p in sources)
+    with instrument.span("hash", source=names):
+        tracked = sources + [id_map] if id_map is not None and id_map.exists() else sources
+        key = {**cache_key(*tracked), "sheets": sheets}
+    if not force and is_up_to_date(out_path, key):
+        print("Unchanged:", out_path)
+        return None
+    ids = GearIds(id_map) if id_map is not None else None
+    with instrument.span("parse", source=names, bytes=sum(p.stat().st_size for p in sources)):
+        data = convert_sources(convert, sources, sheets, jobs, ids)
+    if ids is not None:
+        if ids.save():
+            print("Wrote:", id_map)
+        key = {**cache_key(*sources, id_map), "sheets": sheets}
+    data["meta"].update(key)
+    with instrument.span("write", path=str(out_path)) as s:
+        s["wrote"] = write_json_if_changed(out_path, data)
+        s["bytes"] = out_path.stat().st_size
+    print("Wrote:" if s["wrote"] else "Unchanged:", out_path)
     return data
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--gear-xlsx", required=True, type=Path)
-    ap.add_argument("--patchbay-xlsx", required=True, type=Path)
+    ap.add_argument("--gear-xlsx", required=True, nargs="+", type=Path, help="workbooks or glob patterns")
+    ap.add_argument("--patchbay-xlsx", required=True, nargs="+", type=Path, help="workbooks or glob patterns")
     ap.add_argument("--out-dir", required=True, type=Path)
+    ap.add_argument("--id-map", type=Path, default=None, help="persisted gear ids (default: <out-dir>/gear_id_map.json)")
+    ap.add_argument("--sheets", default="all", help='"all" (default), "active" or a comma list of sheet names')
+    ap.add_argument("--jobs", type=int, default=0, help="worker processes for the sheets (default: one per core)")
+    ap.add_argument("--force", action="store_true", help="convert even if the source workbooks are unchanged")
+    ap.add_argument("--ndjson", action="store_true", help="also write gear.ndjson for streaming consumers")
+    instrument.add_arguments(ap)
     args = ap.parse_args()
-
-    gear = convert_gear_xlsx(args.gear_xlsx)
-    patch = convert_patchbay_xlsx(args.patchbay_xlsx)
-
-    write_json(args.out_dir / "gear.json", gear)
-    write_json(args.out_dir / "patchbay.json", patch)
-
-    print("Wrote:", args.out_dir / "gear.json")
-    print("Wrote:", args.out_dir / "patchbay.json")
+    instrument.start(args.trace, args.profile)
+
+    gear_json = args.out_dir / "gear.json"
+    convert_output(convert_gear_xlsx, expand_sources(args.gear_xlsx), gear_json, force=args.force,
+                   sheets=args.sheets, jobs=args.jobs, id_map=args.id_map or default_id_map_path(gear_json))
+    convert_output(convert_patchbay_xlsx, expand_sources(args.patchbay_xlsx), args.out_dir / "patchbay.json",
+                   force=args.force, sheets=args.sheets, jobs=args.jobs)
+
+    gear_ndjson = args.out_dir / "gear.ndjson"
+    if args.ndjson and (not gear_ndjson.exists() or gear_ndjson.stat().st_mtime < gear_json.stat().st_mtime):
+        gear = json.loads(gear_json.read_text(encoding="utf-8"))
+        with instrument.span("write", path=str(gear_ndjson)) as s:
+            write_ndjson(gear_ndjson, gear["meta"], gear["gear"])
+            s["bytes"] = gear_ndjson.stat().st_size
+        print("Wrote:", gear_ndjson)
 
 if __name__ == "__main__":
     main()
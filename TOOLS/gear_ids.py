@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Stable, collision-free gear ids plus near-duplicate detection, in one pass over the inventory.
+
+slug_id() folds manufacturer + model to [a-z0-9_], so different devices can share an id ("Behringer C-2"
+and "Behringer C 2" are both behringer_c_2, "Röhre" and "R-hre" both r_hre) and the later profile would
+overwrite the earlier <id>.json. Every item is looked up by its identity: manufacturer and model after NFKC,
+casefolding, one kind of dash and single spaces ("C‑2" with a non-breaking hyphen is "C-2").
+  - same identity:                 the same device listed twice; the caller merges the rows
+  - new identity, slug taken:      a collision; the device gets <slug>_2, <slug>_3, ... (first free one)
+  - known identity:                the id it got before, from the persisted id map (gear_id_map.json)
+Ids never move once assigned and are never handed to another device, whatever order the rows come in later;
+entries for devices that left the inventory are kept for that reason.
+
+Near-duplicates ("Moog Mother-32" / "Moog Mother 32", typos) are reported, not merged. They are found in
+one join after the id pass, blocked twice:
+  - by the numbers in the name: "DD-3" and "DD-5" are different pedals however similar the text is, so
+    only names with the same numbers are compared at all
+  - by character trigrams of the identity with only its letters and digits: each trigram set is ordered
+    rarest first and indexed under the prefix that any set with Jaccard >= threshold must share (prefix
+    filtering), so only items meeting in a posting list of rare trigrams are compared
+Candidates are then checked by exact trigram Jaccard; pairs that share a slug are collisions (reported as
+such) and are not listed again. All lookups are dict based; nothing compares all pairs.
+
+Usage:
+  python tools/gear_ids.py --gear-json Data/IFLS_Workbench/gear.json     # report collisions / near-duplicates
+  python tools/gear_ids.py --gear-json Data/IFLS_Workbench/gear.json --id-map Data/IFLS_Workbench/gear_id_map.json
+"""
+import argparse, json, math, re, unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import instrument
+import json_io
+
+ID_MAP_VERSION = 1
+NEAR_THRESHOLD = 0.8
+
+_DASHES = re.compile(r"[\u2010-\u2015\u2043\u2212\ufe58\ufe63\uff0d]")  # hyphens, dashes, minus signs
+
+def identity_key(*parts: str) -> str:
+    """Manufacturer/model as one comparable string: NFKC, casefolded, dashes unified, whitespace collapsed."""
+    s = " ".join(str(p) for p in parts if p and str(p).strip())
+    s = _DASHES.sub("-", unicodedata.normalize("NFKC", s)).casefold()
+    return " ".join(s.split())
+
+def numbers(key: str) -> Tuple[str, ...]:
+    return tuple(n.lstrip("0") or "0" for n in re.findall(r"\d+", key))
+
+def trigrams(key: str) -> Set[str]:
+    compact = "".join(ch for ch in key if ch.isalnum())
+    if len(compact) < 3:
+        return {compact} if compact else set()
+    return {compact[i:i + 3] for i in range(len(compact) - 2)}
+
+def default_id_map_path(gear_json: Path) -> Path:
+    return gear_json.with_name("gear_id_map.json")
+
+class GearIds:
+    """
+    Id assignment for one conversion run. resolve() per item, in inventory order; save() persists the map
+    together with this run's collisions and near-duplicates.
+    """
+    def __init__(self, path: Optional[Path] = None, threshold: float = NEAR_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.ids: Dict[str, str] = self._load(path) if path else {}
+        self.taken = set(self.ids.values())
+        self.seen: Dict[str, str] = {}                  # identity -> id, this run
+        self.by_slug: Dict[str, List[str]] = {}         # slug -> ids of this run's devices with that slug
+        self._grams: List[Set[Tuple[Tuple[str, ...], str]]] = []  # per resolved device: (numbers, trigram)
+        self._names: List[str] = []
+        self._slugs: List[str] = []
+        self._near: Optional[List[Dict[str, Any]]] = None
+
+    @staticmethod
+    def _load(path: Path) -> Dict[str, str]:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+        return data.get("ids", {}) if data.get("version") == ID_MAP_VERSION else {}
+
+    def resolve(self, slug: str, *parts: str) -> Tuple[str, bool]:
+        """(id, duplicate) for the device named by parts, whose plain slug_id() is slug."""
+        key = identity_key(*parts)
+        if key in self.seen:
+            return self.seen[key], True
+        pid = self.ids.get(key)
+        if pid is None:
+            pid, n = slug, 2
+            while pid in self.taken:
+                pid, n = f"{slug}_{n}", n + 1
+            self.ids[key] = pid
+            self.taken.add(pid)
+        self.by_slug.setdefault(slug, []).append(pid)
+        self.seen[key] = pid
+        nums = numbers(key)
+        self._grams.append({(nums, g) for g in trigrams(key)})
+        self._names.append(pid)
+        self._slugs.append(slug)
+        self._near = None
+        return pid, False
+
+    @property
+    def collisions(self) -> Dict[str, List[str]]:
+        return {slug: ids for slug, ids in self.by_slug.items() if len(ids) > 1}
+
+    @property
+    def near_duplicates(self) -> List[Dict[str, Any]]:
+        """
+        Pairs of this run's devices with trigram Jaccard >= threshold, as {"ids": [a, b], "similarity"}.
+        Pairs sharing a slug are already reported as collisions and are left out.
+        """
+        if self._near is None:
+            self._near = self._join()
+        return self._near
+
+    def _join(self) -> List[Dict[str, Any]]:
+        t = self.threshold
+        df = Counter(g for grams in self._grams for g in grams)
+        postings: Dict[str, List[int]] = {}
+        pairs = []
+        for i, grams in enumerate(self._grams):
+            # prefix filtering: with one global order (rarest first), J(A, B) >= t needs a shared gram
+            # among the first |A| - ceil(t|A|) + 1 of A and of B
+            order = sorted(grams, key=lambda g: (df[g], g))
+            prefix = order[:len(order) - math.ceil(t * len(order)) + 1]
+            for j in sorted({j for g in prefix for j in postings.get(g, ())}):
+                other = self._grams[j]
+                if self._slugs[j] == self._slugs[i] or not t * len(grams) <= len(other) <= len(grams) / t:
+                    continue
+                shared = len(grams & other)
+                sim = shared / (len(grams) + len(other) - shared)
+                if sim >= t:
+                    pairs.append({"ids": [self._names[j], self._names[i]], "similarity": round(sim, 3)})
+            for g in prefix:
+                postings.setdefault(g, []).append(i)
+        return pairs
+
+    def report(self) -> List[str]:
+        lines = []
+        for slug, ids in self.collisions.items():
+            lines.append(f"Id collision on {slug}: {', '.join(ids)}")
+        for nd in self.near_duplicates:
+            lines.append(f"Near-duplicate ({nd['similarity']:.2f}): {' / '.join(nd['ids'])}")
+        return lines
+
+    def save(self) -> bool:
+        """Write the id map (only if it changed); returns whether it was written."""
+        text = json_io.dumps({
+            "version": ID_MAP_VERSION,
+            "ids": self.ids,
+            "collisions": self.collisions,
+            "near_duplicates": self.near_duplicates,
+        }) + "\n"
+        if self.path.exists() and self.path.read_text(encoding="utf-8") == text:
+            return False
+        json_io.write_text(self.path, text)
+        return True
+
+def main(argv=None):
+    from excel_to_json import slug_id  # excel_to_json imports this module
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--gear-json", type=Path, default=Path("Data/IFLS_Workbench/gear.json"))
+    ap.add_argument("--id-map", type=Path, default=None, help="check against this id map (read only)")
+    ap.add_argument("--threshold", type=float, default=NEAR_THRESHOLD, help="trigram Jaccard for near-duplicates")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.start(args.trace, args.profile)
+
+    gear = json.loads(args.gear_json.read_text(encoding="utf-8"))["gear"]
+    ids = GearIds(args.id_map, args.threshold)
+    dupes = 0
+    with instrument.span("resolve", items=len(gear)):
+        for it in gear:
+            dupes += ids.resolve(slug_id(it["manufacturer"], it["model"]), it["manufacturer"], it["model"])[1]
+    for line in ids.report():
+        print(line)
+    print(f"{len(gear)} items: {dupes} duplicate(s), {len(ids.collisions)} collision(s), "
+          f"{len(ids.near_duplicates)} near-duplicate pair(s)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
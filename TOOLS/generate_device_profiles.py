@@ -4,10 +4,24 @@ Generate device profile skeletons (mixed language) from gear.json or the source
 
 Usage:
   python tools/generate_device_profiles.py --gear-json Data/IFLS_Workbench/gear.json --out Data/IFLS_Workbench/device_profiles
+
+Gear items are streamed: --gear-json may be gear.json (parsed incrementally with ijson, which is in
+requirements.txt; without it the file is loaded whole) or gear.ndjson (one item per line, see
+excel_to_json.py --ndjson). Profiles are written as items arrive and index entries are appended to
+device_profiles_index.json, so memory stays flat. pipeline.py is the exception: right after the gear stage
+converted the workbook it hands over that in-memory list; only an unchanged gear stage streams gear.json.
 """
-import argparse, json, re
+import argparse, json, os, re
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, zip_longest
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import instrument
+import json_io
 
 PRIORITY = ("synth", "fx", "routing")
 
@@ -29,88 +43,279 @@ def parse_controls(raw: str):
         out.append({"name_en": p, "type": "unknown", "notes_de": ""})
     return out
 
-def classify_priority(item):
-    text = " ".join([
-        item.get("main_category",""),
-        item.get("sub_category",""),
-        item.get("category_type",""),
-        item.get("manufacturer",""),
-        item.get("model",""),
-        item.get("notes_text",""),
-        item.get("tech_text",""),
-    ]).lower()
-    synth_kw = ["synth", "toy", "keyboard", "keys", "groove", "drum machine", "drum", "sampler"]
-    fx_kw = ["delay","reverb","chorus","flanger","phaser","vibrato","tremolo","mod","lofi","bit","crusher","ring","pitch","whammy","filter","envelope"]
-    routing_kw = ["di","reamp","patch","patchbay","mixer","interface","compress","gate","limiter","preamp"]
-    if any(k in text for k in synth_kw):
-        return "synth"
-    if any(k in text for k in routing_kw):
-        return "routing"
-    if any(k in text for k in fx_kw):
-        return "fx"
+# Keywords per priority group, checked in order synth > routing > fx. Each entry is a regex fragment that
+# must start at a word boundary. Plain words also match as a stem ("synth" -> "synthesizer",
+# "compress" -> "compressor"); the short, ambiguous ones are whole words only, so "di" no longer hits
+# "distortion"/"midi", "ring" no longer hits "Behringer" and "mod" no longer hits "model"/"modus".
+# Microphones and receivers are sources on the way into the interface and count as routing; before they only
+# got a group by accident (the "di" in "studio", the "ring" in "Behringer"). tests/test_classify_priority.py
+# pins the result for every item of Data/IFLS_Workbench/gear.json.
+PRIORITY_KEYWORDS = {
+    "synth": ["synth", r"toy\b", "keyboard", r"keys\b", "groove", "drum machine", "drum", "sampler"],
+    "routing": [r"di\b", "reamp", "patch", "mixer", "interface", "compress", r"gate\b", "limiter", "preamp", "routing",
+                r"mi[ck]ro(?:fon|phon)\w*", r"mics?\b", "receiver"],
+    "fx": ["delay", "reverb", "chorus", "flanger", "phaser", "vibrato", "tremolo", r"mod(?:ulat\w*)?\b", "lofi",
+           r"bit(?:crush\w*)?\b", "crusher", r"ring(?:mod)?\b", "pitch", "whammy", "filter", "envelope"],
+}
+_PRIORITY_RE = re.compile(r"\b(?:" + "|".join(
+    f"(?P<{grp}>" + "|".join(kws) + ")" for grp, kws in PRIORITY_KEYWORDS.items()) + ")")
+_CLASSIFY_FIELDS = ("main_category", "sub_category", "category_type", "manufacturer", "model", "notes_text", "tech_text")
+
+def _classify_text(item) -> str:
+    return " ".join(item.get(k,"") for k in _CLASSIFY_FIELDS).lower()
+
+def _pick_group(groups) -> Optional[str]:
+    for grp in PRIORITY_KEYWORDS:
+        if grp in groups:
+            return grp
     return None
 
+def classify_priority(item):
+    groups = set()
+    for m in _PRIORITY_RE.finditer(_classify_text(item)):
+        groups.add(m.lastgroup)
+        if m.lastgroup == "synth":
+            break
+    return _pick_group(groups)
+
+def classify_batch(items) -> List[Optional[str]]:
+    """classify_priority for a whole list of items with one regex pass over the joined texts."""
+    texts = [_classify_text(it) for it in items]
+    starts, pos = [], 0
+    for t in texts:
+        starts.append(pos)
+        pos += len(t) + 1
+    groups: List[set] = [set() for _ in texts]
+    for m in _PRIORITY_RE.finditer("\n".join(texts)):
+        groups[bisect_right(starts, m.start()) - 1].add(m.lastgroup)
+    return [_pick_group(g) for g in groups]
+
+def iter_gear(path: Path):
+    """Yield gear items one at a time from gear.ndjson or gear.json."""
+    if path.suffix.lower() == ".ndjson":
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                obj = json.loads(line)
+                if "meta" in obj and len(obj) == 1:
+                    continue
+                yield obj
+        return
+    try:
+        import ijson
+    except ImportError:
+        ijson = None
+    if ijson is None:
+        yield from json.loads(path.read_text(encoding="utf-8")).get("gear", [])
+        return
+    with path.open("rb") as f:
+        for it in ijson.items(f, "gear.item", use_float=True):
+            yield it
+
+class JsonArrayWriter:
+    """
+    Writes {<head...>, "<key>": [ ... ]} one element at a time, byte-identical to
+    json.dumps(obj, ensure_ascii=False, indent=2) + "\n" of the complete object.
+    The file is written to a temp name and renamed into place on close() (or handed to a json_io.Batch),
+    unless the existing file only differs in its generated_at_utc stamp. Used as a context manager, an error
+    before close() removes the temp file.
+    """
+    def __init__(self, path: Path, head: dict, key: str):
+        self.path = path
+        self.tmp = json_io.tmp_path(path)
+        self.f = self.tmp.open("w", encoding="utf-8")
+        body = json.dumps({**head, key: []}, ensure_ascii=False, indent=2)
+        assert body.endswith("[]\n}")
+        self.f.write(body[:-len("]\n}")])
+        self.count = 0
+
+    def append(self, obj) -> None:
+        item = json_io.dumps(obj).replace("\n", "\n    ")
+        self.f.write(("," if self.count else "") + "\n    " + item)
+        self.count += 1
+
+    def close(self, batch: Optional[json_io.Batch] = None) -> bool:
+        self.f.write(("\n  " if self.count else "") + "]\n}\n")
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+        if same_ignoring_timestamps(self.tmp, self.path):
+            self.tmp.unlink()
+            return False
+        if batch is not None:
+            batch.add(self.tmp, self.path)
+        else:
+            os.replace(self.tmp, self.path)
+            json_io.fsync_dir(self.path.parent)
+        return True
+
+    def discard(self) -> None:
+        self.f.close()
+        self.tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> "JsonArrayWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> Optional[bool]:
+        if exc_type is not None:
+            self.discard()
+        elif not self.f.closed:
+            self.close()
+        return None
+
+def build_profile(it, grp: str, now: str, source: str):
+    pid = it.get("id") or slug_id(it.get("manufacturer",""), it.get("model",""))
+    return {
+        "meta": {"generated_at_utc": now, "language": "mixed", "source": source},
+        "id": pid,
+        "name_de": f"{it.get('manufacturer','')} {it.get('model','')}".strip(),
+        "manufacturer": it.get("manufacturer",""),
+        "model": it.get("model",""),
+        "count": int(it.get("count",0) or 0),
+        "categories_de": {
+            "Hauptkategorie": it.get("main_category",""),
+            "Unterkategorie": it.get("sub_category",""),
+            "Kategorie-Typ": it.get("category_type",""),
+        },
+        "priority_group": grp,
+        "signal_role": [],
+        "level_guess": "instrument_or_line",
+        "io_raw_de": it.get("io_text",""),
+        "controls_raw_de": it.get("controls_text",""),
+        "controls": parse_controls(it.get("controls_text","")),
+        "power_raw_de": it.get("power_text",""),
+        "notes_raw_de": it.get("notes_text",""),
+        "tech_raw_de": it.get("tech_text",""),
+        "patchbay_name": "",
+        "manual_sources": [],
+        "enriched": False,
+        "best_for_tags": [],
+        "danger_zones_de": []
+    }
+
+def render_doc(profile) -> str:
+    md = f"# {profile['name_de']}\n\n**Priority:** {profile['priority_group']}\n\n## Controls (EN)\n"
+    for c in profile["controls"][:40]:
+        md += f"- **{c['name_en']}**\n"
+    return md
+
+_TIMESTAMP_KEY = '"generated_at_utc":'
+
+def same_ignoring_timestamps(a: Path, b: Path) -> bool:
+    """Line-by-line compare (streaming) that ignores "generated_at_utc" lines."""
+    try:
+        with a.open("r", encoding="utf-8") as fa, b.open("r", encoding="utf-8") as fb:
+            for la, lb in zip_longest(fa, fb):
+                if la != lb and not (la and lb and _TIMESTAMP_KEY in la and _TIMESTAMP_KEY in lb):
+                    return False
+        return True
+    except FileNotFoundError:
+        return False
+
+def unchanged(path: Path, text: str) -> bool:
+    """True if path already has text as content, apart from generated_at_utc stamps."""
+    try:
+        old = path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return False
+    new_lines, old_lines = text.splitlines(), old.splitlines()
+    return len(new_lines) == len(old_lines) and all(
+        n == o or (_TIMESTAMP_KEY in n and _TIMESTAMP_KEY in o) for n, o in zip(new_lines, old_lines))
+
+def iter_classified(items, chunk: int = 1024):
+    """(item, priority group) for the classified items; each chunk of the stream is one classify_batch pass."""
+    items = iter(items)
+    while True:
+        block = list(islice(items, chunk))
+        if not block:
+            return
+        yield from ((it, grp) for it, grp in zip(block, classify_batch(block)) if grp)
+
+def process_item(job):
+    """
+    Stage the changed profile/doc of one classified gear item as temp files. Runs in-process or in a pool
+    worker; returns (index entry, [(tmp, path), ...]) and the caller's Batch does the renames.
+    """
+    it, grp, now, source, out, docs_out, only = job
+    profile = build_profile(it, grp, now, source)
+    pid = profile["id"]
+    entry = {"id": pid, "name_de": profile["name_de"], "priority_group": grp}
+    if only and pid not in only:
+        return entry, []
+    with instrument.span("write", id=pid) as s:
+        files = [(out/f"{pid}.json", json_io.dumps(profile)+"\n")]
+        if docs_out:
+            files.append((docs_out/f"{pid}.md", render_doc(profile)))
+        staged = [json_io.stage(path, text) for path, text in files if not unchanged(path, text)]
+        s["wrote"], s["bytes"] = bool(staged), len(files[0][1].encode("utf-8"))
+    return entry, staged
+
+def iter_processed(jobs_iter, jobs: int):
+    """process_item over jobs_iter, in order; with jobs > 1 a process pool runs a bounded window ahead."""
+    if jobs <= 1:
+        yield from map(process_item, jobs_iter)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        pending = deque(ex.submit(process_item, j) for _, j in zip(range(jobs * 4), jobs_iter))
+        while pending:
+            fut = pending.popleft()
+            nxt = next(jobs_iter, None)
+            if nxt is not None:
+                pending.append(ex.submit(process_item, nxt))
+            yield fut.result()
+
+def generate_profiles(items, source: str, out: Path, docs_out: Optional[Path] = None,
+                      jobs: int = 1, only=None) -> Tuple[int, int]:
+    """Write profiles/docs and device_profiles_index.json for an iterable of gear items; returns (total, written)."""
+    now = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+    out.mkdir(parents=True, exist_ok=True)
+    if docs_out:
+        docs_out.mkdir(parents=True, exist_ok=True)
+
+    jobs_iter = ((it, grp, now, source, out, docs_out, only) for it, grp in iter_classified(items))
+    written = total = 0
+    seen = set()
+    # all files become visible (and durable) together when the batch commits; on error no temp file is left
+    with json_io.Batch() as batch, JsonArrayWriter(out.parent/"device_profiles_index.json",
+                                                   {"meta":{"generated_at_utc": now}}, "devices") as idx:
+        with instrument.span("generate", source=source, jobs=jobs) as s:
+            for entry, staged in iter_processed(jobs_iter, jobs):
+                if entry["id"] in seen:
+                    # never let a second device overwrite <id>.json; excel_to_json.py gives colliding ids a suffix
+                    print(f"Duplicate profile id {entry['id']} ({entry['name_de']}) skipped")
+                    for tmp, _ in staged:
+                        Path(tmp).unlink(missing_ok=True)
+                    continue
+                seen.add(entry["id"])
+                idx.append(entry)
+                total += 1
+                written += bool(staged)
+                for tmp, path in staged:
+                    batch.add(tmp, path)
+            s["profiles"], s["written"] = total, written
+        idx.close(batch)
+        with instrument.span("commit", files=len(batch.staged)):
+            batch.commit()
+    return total, written
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--gear-json", required=True, type=Path)
     ap.add_argument("--out", required=True, type=Path)
     ap.add_argument("--docs-out", default=None, type=Path)
+    ap.add_argument("--jobs", type=int, default=1, help="worker processes for profile generation")
+    ap.add_argument("--only", nargs="+", default=None, metavar="ID",
+                    help="only (re)write these profile ids (comma or space separated); the index stays complete")
+    instrument.add_arguments(ap)
     args = ap.parse_args()
+    instrument.start(args.trace, args.profile)
 
-    data = json.loads(args.gear_json.read_text(encoding="utf-8"))
-    gear = data.get("gear", [])
-    now = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
-
-    args.out.mkdir(parents=True, exist_ok=True)
-    if args.docs_out:
-        args.docs_out.mkdir(parents=True, exist_ok=True)
-
-    idx = []
-    for it in gear:
-        grp = classify_priority(it)
-        if not grp:
-            continue
-        pid = it.get("id") or slug_id(it.get("manufacturer",""), it.get("model",""))
-        profile = {
-            "meta": {"generated_at_utc": now, "language": "mixed", "source": str(args.gear_json)},
-            "id": pid,
-            "name_de": f"{it.get('manufacturer','')} {it.get('model','')}".strip(),
-            "manufacturer": it.get("manufacturer",""),
-            "model": it.get("model",""),
-            "count": int(it.get("count",0) or 0),
-            "categories_de": {
-                "Hauptkategorie": it.get("main_category",""),
-                "Unterkategorie": it.get("sub_category",""),
-                "Kategorie-Typ": it.get("category_type",""),
-            },
-            "priority_group": grp,
-            "signal_role": [],
-            "level_guess": "instrument_or_line",
-            "io_raw_de": it.get("io_text",""),
-            "controls_raw_de": it.get("controls_text",""),
-            "controls": parse_controls(it.get("controls_text","")),
-            "power_raw_de": it.get("power_text",""),
-            "notes_raw_de": it.get("notes_text",""),
-            "tech_raw_de": it.get("tech_text",""),
-            "patchbay_name": "",
-            "manual_sources": [],
-            "enriched": False,
-            "best_for_tags": [],
-            "danger_zones_de": []
-        }
-        (args.out/f"{pid}.json").write_text(json.dumps(profile, ensure_ascii=False, indent=2)+"\n", encoding="utf-8")
-        idx.append({"id": pid, "name_de": profile["name_de"], "priority_group": grp})
-
-        if args.docs_out:
-            md = f"# {profile['name_de']}\n\n**Priority:** {grp}\n\n## Controls (EN)\n"
-            for c in profile["controls"][:40]:
-                md += f"- **{c['name_en']}**\n"
-            (args.docs_out/f"{pid}.md").write_text(md, encoding="utf-8")
-
-    (args.out.parent/"device_profiles_index.json").write_text(
-        json.dumps({"meta":{"generated_at_utc": now}, "devices": idx}, ensure_ascii=False, indent=2)+"\n",
-        encoding="utf-8"
-    )
+    only = frozenset(i.strip() for v in args.only for i in v.split(",") if i.strip()) if args.only else None
+    total, written = generate_profiles(iter_gear(args.gear_json), str(args.gear_json), args.out,
+                                       args.docs_out, jobs=args.jobs, only=only)
+    print(f"Profiles: {total} ({written} written, {total - written} unchanged)")
 
 if __name__ == "__main__":
     main()
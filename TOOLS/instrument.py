@@ -0,0 +1,126 @@
+"""
+Span instrumentation shared by the TOOLS scripts.
+
+  with span("fetch", url=url) as s:
+      body = get(url)
+      s["bytes"] = len(body)
+
+- Every span is timed and folded into per-name totals (count, seconds, bytes); that costs a perf_counter
+  call and a dict update, so spans stay in place when tracing is off.
+- start(trace=PATH) additionally appends each finished span as one NDJSON line to PATH:
+    {"name": "fetch", "ts": <epoch start>, "seconds": 0.41, "pid": ..., "thread": ..., "url": ..., "bytes": ...}
+  The path is exported as IFLS_TRACE, so process-pool workers append to the same file.
+- annotate(**attrs) adds attributes to the innermost open span of the current thread (used by
+  ManualCache to tag fetches with hit/miss/revalidated/stale).
+- start(profile=PATH) runs cProfile over the main thread and dumps pstats to PATH at exit.
+- At exit a {"event": "summary"} line is written and the totals are printed.
+"""
+import atexit, json, os, sys, threading, time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+TRACE_ENV = "IFLS_TRACE"
+
+_lock = threading.Lock()
+_local = threading.local()
+_totals: Dict[str, Dict[str, float]] = {}
+_counters: Dict[str, Dict[str, Any]] = {}
+_fd: Optional[int] = None
+_fd_pid: Optional[int] = None
+_profiler = None
+_profile_path: Optional[Path] = None
+_started = False
+
+def add_arguments(ap) -> None:
+    ap.add_argument("--trace", type=Path, default=None, help="append an NDJSON span trace to this file")
+    ap.add_argument("--profile", type=Path, default=None, help="dump cProfile stats (pstats format) to this file")
+
+def start(trace: Optional[Path] = None, profile: Optional[Path] = None, script: str = "") -> None:
+    """Enable the trace file and/or cProfile for this process; later calls (nested mains) are no-ops."""
+    global _started, _profiler, _profile_path
+    if _started:
+        return
+    _started = True
+    if trace:
+        Path(trace).parent.mkdir(parents=True, exist_ok=True)
+        os.environ[TRACE_ENV] = str(Path(trace).resolve())
+        _write({"event": "start", "script": script or Path(sys.argv[0]).name, "argv": sys.argv[1:],
+                "ts": time.time(), "pid": os.getpid()})
+    if profile:
+        import cProfile
+        _profile_path = Path(profile)
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    if trace or profile:
+        atexit.register(finish)
+
+def _write(obj: Dict[str, Any]) -> None:
+    global _fd, _fd_pid
+    path = os.environ.get(TRACE_ENV)
+    if not path:
+        return
+    if _fd is None or _fd_pid != os.getpid():
+        # (re)open per process: forked pool workers must not share the parent's descriptor state
+        _fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        _fd_pid = os.getpid()
+    os.write(_fd, (json.dumps(obj, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+
+@contextmanager
+def span(name: str, **attrs):
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    rec: Dict[str, Any] = dict(attrs)
+    stack.append(rec)
+    ts, t0 = time.time(), time.perf_counter()
+    try:
+        yield rec
+    except BaseException as e:
+        rec["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        stack.pop()
+        with _lock:
+            tot = _totals.setdefault(name, {"count": 0, "seconds": 0.0, "bytes": 0})
+            tot["count"] += 1
+            tot["seconds"] += seconds
+            if isinstance(rec.get("bytes"), int):
+                tot["bytes"] += rec["bytes"]
+        _write({"name": name, "ts": ts, "seconds": round(seconds, 6), "pid": os.getpid(),
+                "thread": threading.current_thread().name, **rec})
+
+def annotate(**attrs) -> None:
+    """Attach attributes to the current thread's innermost open span (no-op outside a span)."""
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].update(attrs)
+
+def count(group: str, **values) -> None:
+    """Record named counters (e.g. cache stats) for the summary."""
+    with _lock:
+        _counters.setdefault(group, {}).update(values)
+
+def summary() -> Dict[str, Any]:
+    with _lock:
+        return {"spans": {k: dict(v) for k, v in _totals.items()}, "counters": {k: dict(v) for k, v in _counters.items()}}
+
+def finish() -> None:
+    global _profiler
+    if _profiler is not None:
+        import pstats
+        _profiler.disable()
+        _profiler.dump_stats(str(_profile_path))
+        pstats.Stats(_profiler).sort_stats("cumulative").print_stats(25)
+        print("Profile:", _profile_path)
+        _profiler = None
+    s = summary()
+    _write({"event": "summary", "ts": time.time(), "pid": os.getpid(), **s})
+    if not s["spans"]:
+        return
+    print(f"\n{'span':<18} {'count':>7} {'seconds':>9} {'bytes':>12}")
+    for name, t in sorted(s["spans"].items(), key=lambda kv: -kv[1]["seconds"]):
+        print(f"{name:<18} {t['count']:>7} {t['seconds']:>9.3f} {int(t['bytes']):>12}")
+    for group, values in s["counters"].items():
+        print(f"{group}: {values}")
@@ -0,0 +1,151 @@
+"""
+Shared JSON serialization and crash-safe file writes for the TOOLS scripts.
+
+- dumps(obj) is byte-for-byte json.dumps(obj, ensure_ascii=False, indent=2). It uses orjson when it is
+  installed and the object only holds types orjson renders identically (dicts with str keys, lists,
+  str, int, bool, None); anything else (floats, tuples, non-str keys, ...) goes through the stdlib.
+- write_text()/write_json()/atomic_open() replace a file atomically: temp file in the same directory,
+  fsync, rename, fsync of the directory. An interrupted run leaves either the old or the new file, never a truncated one.
+- Batch collects many writes and makes them visible together: each file is staged as a temp file and
+  fsynced (in the pool worker that wrote it, when stage() runs there), then the renames happen and each
+  touched directory is fsynced once. No rename ever points at data that is not on disk yet, on any OS.
+  The parent adopts files staged elsewhere with add().
+"""
+import itertools, json, os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_INT64_MIN, _UINT64_MAX = -(1 << 63), (1 << 64) - 1
+_tmp_counter = itertools.count()
+
+def _orjson_safe(obj: Any) -> bool:
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        t = type(o)
+        if t is dict:
+            for k, v in o.items():
+                if type(k) is not str:
+                    return False
+                stack.append(v)
+        elif t is list:
+            stack.extend(o)
+        elif t is int:
+            if not _INT64_MIN <= o <= _UINT64_MAX:
+                return False
+        elif not (t is str or t is bool or o is None):
+            return False
+    return True
+
+def dumps(obj: Any) -> str:
+    """json.dumps(obj, ensure_ascii=False, indent=2), via orjson where that gives the same text."""
+    if orjson is not None and _orjson_safe(obj):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+        except (TypeError, orjson.JSONEncodeError):
+            pass  # e.g. lone surrogates, which the stdlib passes through
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+def tmp_path(path: Path) -> Path:
+    """Unique hidden temp name next to path (unique per process and call, so pool workers never collide)."""
+    return path.with_name(f".{path.name}.{os.getpid()}.{next(_tmp_counter)}.tmp")
+
+def fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows: directories cannot be opened
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_open(path: Path):
+    """Text handle whose content atomically replaces path when the block exits normally (dropped on error)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = tmp_path(path)
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    fsync_dir(path.parent)
+
+def write_text(path: Path, text: str) -> None:
+    """Atomically replace path with text (UTF-8) and make it durable."""
+    with atomic_open(path) as f:
+        f.write(text)
+
+def write_json(path: Path, obj: Any) -> None:
+    write_text(path, dumps(obj) + "\n")
+
+def stage(path: Path, text: str) -> Tuple[str, str]:
+    """Write text to a durable (fsynced) temp file next to path; returns (tmp, path) for Batch.add()."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = tmp_path(path)
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return str(tmp), str(path)
+
+class Batch:
+    """
+    Atomic bulk writes, with one directory fsync per directory instead of one per file:
+
+      with Batch() as batch:
+          batch.write(path, text)        # or batch.add(*stage(path, text)) from a worker
+      # on normal exit: renames, one fsync per directory; on error: temp files are removed
+
+    Files handed to add() must already be fsynced (stage() does that).
+    """
+    def __init__(self):
+        self.staged: List[Tuple[str, str]] = []
+
+    def write(self, path: Path, text: str) -> None:
+        self.add(*stage(path, text))
+
+    def add(self, tmp, path) -> None:
+        self.staged.append((str(tmp), str(path)))
+
+    def commit(self) -> int:
+        staged, self.staged = self.staged, []
+        if not staged:
+            return 0
+        for tmp, path in staged:
+            os.replace(tmp, path)
+        for d in {os.path.dirname(path) or "." for _, path in staged}:
+            fsync_dir(Path(d))
+        return len(staged)
+
+    def discard(self) -> None:
+        for tmp, _ in self.staged:
+            Path(tmp).unlink(missing_ok=True)
+        self.staged = []
+
+    def __enter__(self) -> "Batch":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> Optional[bool]:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return None
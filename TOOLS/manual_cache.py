@@ -0,0 +1,169 @@
+"""
+Content-addressed on-disk cache for downloaded manuals (PDF/HTML).
+
+Layout (under --cache-dir, default Evidence/manuals/.cache):
+  blobs/<sha256>   raw response bodies, shared by every URL that returns the same bytes
+  index.json       url -> {sha256, size, content_type, etag, last_modified, fetched_at, last_used}
+
+- Known URLs are revalidated with a conditional GET (If-None-Match / If-Modified-Since);
+  a 304 answer re-uses the blob without downloading the body.
+- Entries younger than `ttl` seconds are served without touching the network at all.
+- `offline=True` (--cache-only) never touches the network; unknown URLs raise CacheMiss.
+- A cached manual is served when revalidation fails for a connection error, a timeout or a 5xx answer
+  (stale-if-error). A 4xx answer (404/410: the manual was withdrawn) is passed on to the caller.
+- `max_bytes` caps the blob store; least recently used URLs are evicted first.
+"""
+import hashlib, json, os, threading, time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import instrument
+import json_io
+
+DEFAULT_CACHE_DIR = Path("Evidence/manuals/.cache")
+
+class CacheMiss(RuntimeError):
+    """An offline cache (--cache-only) has no copy of the URL: says nothing about the URL itself."""
+
+def is_transient(exc: BaseException) -> bool:
+    """Connection errors, timeouts and 5xx answers: the site may be back later, unlike a 4xx answer."""
+    import requests
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is None or exc.response.status_code >= 500
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+class ManualCache:
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = 0, ttl: float = 0, offline: bool = False):
+        self.root = Path(root)
+        self.blobs = self.root / "blobs"
+        self.index_path = self.root / "index.json"
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.offline = offline
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self.index: Dict[str, Dict[str, Any]] = {}
+        if self.index_path.exists():
+            try:
+                self.index = json.loads(self.index_path.read_text(encoding="utf-8")).get("urls", {})
+            except Exception:
+                self.index = {}
+
+    def _count(self, kind: str) -> None:
+        self.stats[kind] += 1
+        instrument.annotate(cache=kind)
+
+    def hit_rate(self) -> float:
+        """Share of lookups served from the cache (fresh hits, 304 revalidations and stale fallbacks)."""
+        served = self.stats["hit"] + self.stats["revalidated"] + self.stats["stale"]
+        total = served + self.stats["miss"] + self.stats["miss_offline"]
+        return round(served / total, 3) if total else 0.0
+
+    def has(self, url: str) -> bool:
+        return self._entry(url) is not None
+
+    def _blob_path(self, sha: str) -> Path:
+        return self.blobs / sha
+
+    def _entry(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            e = self.index.get(url)
+        if e and self._blob_path(e["sha256"]).exists():
+            return e
+        return None
+
+    def _read(self, url: str, e: Dict[str, Any]) -> Tuple[Path, str]:
+        with self._lock:
+            e["last_used"] = time.time()
+        return self._blob_path(e["sha256"]), e.get("content_type", "")
+
+    def _store(self, url: str, content: bytes, headers) -> Dict[str, Any]:
+        sha = hashlib.sha256(content).hexdigest()
+        blob = self._blob_path(sha)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp = blob.with_name(f".{sha}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(content)
+            os.replace(tmp, blob)
+        now = time.time()
+        e = {
+            "sha256": sha,
+            "size": len(content),
+            "content_type": headers.get("content-type", "").lower(),
+            "etag": headers.get("etag", ""),
+            "last_modified": headers.get("last-modified", ""),
+            "fetched_at": now,
+            "last_used": now,
+        }
+        with self._lock:
+            self.index[url] = e
+        return e
+
+    def fetch(self, url: str, session) -> Tuple[bytes, str]:
+        """Same contract as enrich_from_manual_map.fetch_text: returns (content, content_type)."""
+        path, ct = self.fetch_path(url, session)
+        return path.read_bytes(), ct
+
+    def fetch_path(self, url: str, session) -> Tuple[Path, str]:
+        """Like fetch(), but returns the blob path (named by its sha256) so callers can stream/mmap it."""
+        e = self._entry(url)
+        if self.offline:
+            if not e:
+                self._count("miss_offline")
+                raise CacheMiss(f"Not in manual cache (--cache-only): {url}")
+            self._count("hit")
+            return self._read(url, e)
+        if e and self.ttl and time.time() - e.get("fetched_at", 0) < self.ttl:
+            self._count("hit")
+            return self._read(url, e)
+
+        headers = {}
+        if e and e.get("etag"):
+            headers["If-None-Match"] = e["etag"]
+        if e and e.get("last_modified"):
+            headers["If-Modified-Since"] = e["last_modified"]
+        try:
+            r = session.get(url, timeout=30, headers=headers)
+            if r.status_code == 304 and e:
+                self._count("revalidated")
+                with self._lock:
+                    e["fetched_at"] = time.time()
+                return self._read(url, e)
+            r.raise_for_status()
+        except Exception as exc:
+            if e and is_transient(exc):
+                # stale-if-error: a flaky vendor site should not drop a manual we already have
+                self._count("stale")
+                return self._read(url, e)
+            raise
+        self._count("miss")
+        self.stats["bytes_downloaded"] += len(r.content)
+        e = self._store(url, r.content, r.headers)
+        return self._blob_path(e["sha256"]), e["content_type"]
+
+    def evict(self) -> None:
+        """Drop least recently used URLs until the referenced blobs fit max_bytes, then delete orphan blobs."""
+        with self._lock:
+            if self.max_bytes:
+                sizes = {e["sha256"]: e.get("size", 0) for e in self.index.values()}
+                total = sum(sizes.values())
+                for url, e in sorted(self.index.items(), key=lambda kv: kv[1].get("last_used", 0)):
+                    if total <= self.max_bytes:
+                        break
+                    del self.index[url]
+                    if not any(o["sha256"] == e["sha256"] for o in self.index.values()):
+                        total -= sizes.get(e["sha256"], 0)
+                    self.stats["evicted"] += 1
+            live = {e["sha256"] for e in self.index.values()}
+        if self.blobs.exists():
+            for p in self.blobs.iterdir():
+                if p.name not in live and not p.name.startswith("."):
+                    p.unlink()
+
+    def save(self) -> None:
+        self.evict()
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data = json.dumps({"urls": self.index}, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+        json_io.write_text(self.index_path, data)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the data build, run as a dependency graph instead of four scripts in a fixed order:
+
+  gear (excel_to_json) ──> profiles (generate_device_profiles) ──> enrich (enrich_from_manual_map)
+  enrich ──> coverage (coverage_report) ──> evidence (evidence_index)
+  enrich + patchbay (excel_to_json) ──> routing (chain_routing: every chain preset must fit the patchbay)
+
+- Stages that read a directory run after the last stage writing it: routing globs device_profiles, so it
+  waits for enrich; coverage and evidence both refresh the one profile catalog (SQLite), so they run one
+  after the other instead of racing for its write lock.
+- A stage starts as soon as its dependencies are done; independent stages (patchbay vs. the gear chain)
+  run concurrently.
+- Results are handed over in memory: profiles are generated from the converted gear data directly
+  instead of re-reading gear.json.
+- A stage is skipped when its inputs/outputs, its scripts and its options are unchanged since the last
+  successful run. Fingerprints are content hashes taken at the end of a run and kept in
+  <data-dir>/pipeline_state.json (git-ignored; CI restores it with actions/cache, see
+  .github/workflows/build-profiles-and-chains.yml).
+  The scripts' own incremental checks (input hashes, enrich manifest, profile catalog) still apply.
+- Per-stage timings are printed at the end.
+
+Usage:
+  python tools/pipeline.py --gear-xlsx SourceData/Geraeteliste.xlsx --patchbay-xlsx "SourceData/Patchbay Übersicht.xlsx"
+  python tools/pipeline.py ... --stages gear,profiles      # only these stages, the rest counts as skipped
+  python tools/pipeline.py ... --force                     # ignore pipeline_state.json
+"""
+import argparse, hashlib, json, sys, time, traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import chain_routing
+import coverage_report
+import enrich_from_manual_map
+import evidence_index
+import excel_to_json
+import gear_ids
+import generate_device_profiles
+import instrument
+import json_io
+import manual_cache
+
+TOOLS_DIR = Path(__file__).resolve().parent
+STATE_VERSION = 2
+
+class Stage:
+    """
+    One node of the graph. run(results) gets the return values of the dependencies by stage name.
+    paths are fingerprinted (files by content, directories by the names and contents of their files), together with the
+    stage's code files and options. pending(), if given, forces a run while it returns True.
+    """
+    def __init__(self, name: str, deps: List[str], paths: List[Path], code: List[str], options: Dict[str, Any],
+                 run: Callable[[Dict[str, Any]], Any], pending: Optional[Callable[[], bool]] = None):
+        self.name = name
+        self.pending = pending  # work that is due regardless of the fingerprint (enrich's queue)
+        self.deps = deps
+        self.paths = paths
+        self.code = code
+        self.options = options
+        self.run = run
+
+    def fingerprint(self) -> str:
+        h = hashlib.sha256(json.dumps(self.options, sort_keys=True, default=str).encode("utf-8"))
+        for name in self.code:
+            h.update(excel_to_json.file_sha256(TOOLS_DIR / name).encode("ascii"))
+        for p in self.paths:
+            h.update(f"\0{p}\0".encode("utf-8"))
+            if p.is_dir():
+                # by content, not mtime: a fresh checkout (CI) touches every file without changing any
+                for f in sorted(p.rglob("*")):
+                    if f.is_file():
+                        h.update(f"{f.relative_to(p).as_posix()}\t{excel_to_json.file_sha256(f)}\n".encode("utf-8"))
+            elif p.exists():
+                h.update(excel_to_json.file_sha256(p).encode("ascii"))
+            else:
+                h.update(b"<missing>")
+        return h.hexdigest()
+
+def load_state(path: Path) -> Dict[str, str]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return data.get("stages", {}) if data.get("version") == STATE_VERSION else {}
+
+def save_state(path: Path, stages: Dict[str, str]) -> None:
+    json_io.write_text(path, json.dumps({"version": STATE_VERSION, "stages": stages}, indent=2, sort_keys=True) + "\n")
+
+def build_stages(args) -> List[Stage]:
+    data = args.data_dir
+    profiles_dir = data / "device_profiles"
+    docs_out = data / "docs_generated" / "devices"
+    gear_json = data / "gear.json"
+    id_map = gear_ids.default_id_map_path(gear_json)
+    manual_map = args.manual_map or data / "manual_map.csv"
+    gear_xlsx = excel_to_json.expand_sources(args.gear_xlsx)
+    patchbay_xlsx = excel_to_json.expand_sources(args.patchbay_xlsx)
+
+    def run_gear(results):
+        return excel_to_json.convert_output(excel_to_json.convert_gear_xlsx, gear_xlsx, gear_json, id_map=id_map)
+
+    def run_patchbay(results):
+        return excel_to_json.convert_output(excel_to_json.convert_patchbay_xlsx, patchbay_xlsx,
+                                            data / "patchbay.json")
+
+    def run_routing(results):
+        argv = ["--patchbay", str(data / "patchbay.json"), "--profiles-dir", str(profiles_dir),
+                "--presets", str(data / "chains" / "chain_presets.json"), str(data / "chain_presets")]
+        if chain_routing.main(argv):
+            raise RuntimeError("some chain presets cannot be routed through the patchbay")
+
+    def run_profiles(results):
+        gear = results.get("gear")
+        items = iter(gear["gear"]) if gear else generate_device_profiles.iter_gear(gear_json)
+        total, written = generate_device_profiles.generate_profiles(items, str(gear_json), profiles_dir, docs_out,
+                                                                    jobs=args.jobs)
+        print(f"Profiles: {total} ({written} written, {total - written} unchanged)")
+        return written
+
+    def run_enrich(results):
+        argv = ["--manual-map", str(manual_map), "--profiles-dir", str(profiles_dir), "--max", str(args.enrich_max)]
+        if args.cache_only:
+            argv.append("--cache-only")
+        enrich_from_manual_map.main(argv)
+
+    def enrich_pending():
+        # rows that are new, due for retry or due for a re-check keep the stage running across nightly batches
+        e = enrich_from_manual_map
+        manifest = e.load_manifest(data / "manual_enrich_manifest.json")
+        queue, _ = e.build_queue(e.load_rows(manual_map, profiles_dir), manifest, profiles_dir, e.EXTRACTOR_VERSION,
+                                 time.time(), e.DEFAULT_RECHECK_DAYS * 86400)
+        if args.cache_only:  # offline, rows never downloaded cannot make progress
+            cache = manual_cache.ManualCache(manual_cache.DEFAULT_CACHE_DIR, offline=True)
+            queue = [r for r in queue if cache.has(r["manual_url"].strip())]
+        return bool(queue)
+
+    def run_coverage(results):
+        coverage_report.main(["--profiles-dir", str(profiles_dir), "--out-dir", str(args.docs_dir)])
+
+    def run_evidence(results):
+        evidence_index.main(["--evidence-dir", str(args.evidence_dir), "--profiles-dir", str(profiles_dir),
+                             "--manual-map", str(manual_map)])
+
+    profile_outputs = [profiles_dir, docs_out, data / "device_profiles_index.json"]
+    return [
+        Stage("gear", [], gear_xlsx + [gear_json, id_map], ["excel_to_json.py", "gear_ids.py"], {}, run_gear),
+        Stage("patchbay", [], patchbay_xlsx + [data / "patchbay.json"], ["excel_to_json.py"], {}, run_patchbay),
+        Stage("routing", ["patchbay", "enrich"], [data / "patchbay.json", data / "chains" / "chain_presets.json",
+                                        data / "chain_presets", profiles_dir], ["chain_routing.py"], {}, run_routing),
+        Stage("profiles", ["gear"], [gear_json] + profile_outputs, ["generate_device_profiles.py"], {}, run_profiles),
+        Stage("enrich", ["profiles"], [manual_map, profiles_dir, data / "manual_enrich_manifest.json"],
+              ["enrich_from_manual_map.py", "manual_cache.py"],
+              {"max": args.enrich_max, "cache_only": args.cache_only}, run_enrich, pending=enrich_pending),
+        Stage("coverage", ["enrich"], [profiles_dir, args.docs_dir / "coverage_report.csv"],
+              ["coverage_report.py", "profile_catalog.py"], {}, run_coverage),
+        Stage("evidence", ["coverage"], [args.evidence_dir, profiles_dir, manual_map],
+              ["evidence_index.py", "enrich_from_manual_map.py", "profile_catalog.py"], {}, run_evidence),
+    ]
+
+def run_graph(stages: List[Stage], selected, state: Dict[str, str], force: bool):
+    """Run stages in dependency order, independent ones in parallel; returns (status, seconds, results) by name."""
+    status: Dict[str, str] = {}
+    seconds: Dict[str, float] = {}
+    results: Dict[str, Any] = {}
+    pending = {s.name: s for s in stages}
+
+    def execute(stage: Stage):
+        t0 = time.perf_counter()
+        with instrument.span("stage", stage=stage.name) as s:
+            try:
+                if stage.name not in selected:
+                    result = "not selected", None
+                elif not force and state.get(stage.name) == stage.fingerprint() \
+                        and not (stage.pending and stage.pending()):
+                    result = "unchanged", None
+                else:
+                    result = "ran", stage.run({d: results.get(d) for d in stage.deps})
+                s["status"] = result[0]
+                return result
+            finally:
+                seconds[stage.name] = time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=len(stages)) as ex:
+        running = {}
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(d in pending or d in running.values() for d in stage.deps):
+                    continue
+                del pending[name]
+                if any(status[d] in ("failed", "blocked") for d in stage.deps):
+                    status[name], seconds[name] = "blocked", 0.0
+                    continue
+                running[ex.submit(execute, stage)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    status[name], results[name] = fut.result()
+                except Exception:
+                    traceback.print_exc()
+                    status[name] = "failed"
+    return status, seconds, results
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--gear-xlsx", required=True, nargs="+", type=Path, help="workbooks or glob patterns")
+    ap.add_argument("--patchbay-xlsx", required=True, nargs="+", type=Path, help="workbooks or glob patterns")
+    ap.add_argument("--data-dir", type=Path, default=Path("Data/IFLS_Workbench"))
+    ap.add_argument("--manual-map", type=Path, default=None, help="default: <data-dir>/manual_map.csv")
+    ap.add_argument("--docs-dir", type=Path, default=Path("Docs"), help="coverage report output directory")
+    ap.add_argument("--evidence-dir", type=Path, default=Path("Evidence"), help="documents for the evidence index")
+    ap.add_argument("--stages", default=None, help="comma list of stages to run (default: all)")
+    ap.add_argument("--force", action="store_true", help="ignore pipeline_state.json and run every selected stage")
+    ap.add_argument("--jobs", type=int, default=1, help="worker processes for profile generation")
+    ap.add_argument("--enrich-max", type=int, default=20, help="passed to enrich_from_manual_map.py --max")
+    ap.add_argument("--cache-only", action="store_true", help="enrich offline from the manual cache")
+    instrument.add_arguments(ap)
+    args = ap.parse_args(argv)
+    instrument.start(args.trace, args.profile)
+
+    stages = build_stages(args)
+    names = [s.name for s in stages]
+    selected = set(names)
+    if args.stages:
+        selected = {s.strip() for s in args.stages.split(",") if s.strip()}
+        unknown = selected - set(names)
+        if unknown:
+            ap.error(f"unknown stage(s): {', '.join(sorted(unknown))} (known: {', '.join(names)})")
+
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    state_path = args.data_dir / "pipeline_state.json"
+    state = load_state(state_path)
+    t0 = time.perf_counter()
+    status, seconds, _ = run_graph(stages, selected, state, args.force)
+
+    # Fingerprint after the whole run, so edits made by later stages (enrich rewrites profiles)
+    # do not make earlier stages look dirty next time.
+    for s in stages:
+        if status[s.name] in ("ran", "unchanged"):
+            state[s.name] = s.fingerprint()
+    save_state(state_path, state)
+
+    print(f"\n{'stage':<10} {'status':<13} {'seconds':>8}")
+    for name in names:
+        print(f"{name:<10} {status[name]:<13} {seconds.get(name, 0.0):>8.2f}")
+    print(f"{'total':<10} {'':<13} {time.perf_counter() - t0:>8.2f}")
+    return 1 if any(v in ("failed", "blocked") for v in status.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
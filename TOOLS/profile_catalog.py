@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+SQLite catalog of device profiles (Data/IFLS_Workbench/device_profiles/*.json).
+
+The catalog is rebuilt incrementally: a profile is only re-read when its mtime/size changed, and only
+re-parsed when its sha256 changed. Queries then hit indexes instead of parsing the whole directory:
+  - profiles: one row per file, indexed on id, manufacturer, priority_group and the verification flags
+  - controls_fts: FTS5 table over control labels/notes (plain LIKE fallback if FTS5 is unavailable)
+
+Usage:
+  python tools/profile_catalog.py --profiles-dir Data/IFLS_Workbench/device_profiles
+  python tools/profile_catalog.py --profiles-dir Data/IFLS_Workbench/device_profiles --search "rate"
+  python tools/profile_catalog.py --profiles-dir Data/IFLS_Workbench/device_profiles --manufacturer Behringer
+"""
+import argparse, hashlib, json, sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import instrument
+
+CATALOG_VERSION = 1
+
+# Columns shared with coverage_report.py (same names and meaning as its report rows).
+ROW_COLUMNS = [
+    "id", "name_de", "manufacturer", "model", "priority_group", "category_de",
+    "controls_count", "manual_sources_count", "controls_completeness", "manual_verified", "panel_verified",
+]
+
+def default_db_path(profiles_dir: Path) -> Path:
+    return profiles_dir.parent / "device_profiles_catalog.sqlite"
+
+def profile_row(obj: Dict[str, Any]) -> Dict[str, Any]:
+    controls = obj.get("controls") or []
+    ms = obj.get("manual_sources") or []
+    meta = obj.get("meta") or {}
+    return {
+        "id": obj.get("id"),
+        "name_de": obj.get("name_de"),
+        "manufacturer": obj.get("manufacturer"),
+        "model": obj.get("model"),
+        "priority_group": obj.get("priority_group"),
+        "category_de": obj.get("category_de"),
+        "controls_count": len(controls),
+        "manual_sources_count": len(ms),
+        "controls_completeness": meta.get("controls_completeness",""),
+        "manual_verified": bool(meta.get("manual_verified")),
+        "panel_verified": bool(meta.get("panel_verified")) or bool(obj.get("controls_verified_by_image")),
+    }
+
+def _control_texts(obj: Dict[str, Any]):
+    for c in obj.get("controls") or []:
+        if isinstance(c, dict):
+            yield str(c.get("name_en") or c.get("name") or ""), str(c.get("notes_de") or "")
+        else:
+            yield str(c), ""
+
+class ProfileCatalog:
+    def __init__(self, profiles_dir: Path, db_path: Optional[Path] = None):
+        self.profiles_dir = Path(profiles_dir)
+        self.db_path = Path(db_path) if db_path else default_db_path(self.profiles_dir)
+        self.db = sqlite3.connect(str(self.db_path))
+        self.db.row_factory = sqlite3.Row
+        self.fts = True
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        ver = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if ver != CATALOG_VERSION:
+            for t in ("profiles", "controls_fts", "controls"):
+                self.db.execute(f"DROP TABLE IF EXISTS {t}")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                file TEXT PRIMARY KEY,
+                mtime_ns INTEGER, size INTEGER, sha256 TEXT,
+                id TEXT, name_de TEXT, manufacturer TEXT, model TEXT, priority_group TEXT, category_de TEXT,
+                controls_count INTEGER, manual_sources_count INTEGER, controls_completeness TEXT,
+                manual_verified INTEGER, panel_verified INTEGER, enriched INTEGER,
+                json TEXT
+            );
+            CREATE INDEX IF NOT EXISTS profiles_id ON profiles(id);
+            CREATE INDEX IF NOT EXISTS profiles_manufacturer ON profiles(manufacturer COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS profiles_priority ON profiles(priority_group);
+            CREATE INDEX IF NOT EXISTS profiles_verified ON profiles(manual_verified, panel_verified);
+        """)
+        try:
+            self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS controls_fts USING fts5(file UNINDEXED, name_en, notes_de)")
+        except sqlite3.OperationalError:
+            self.fts = False
+            self.db.execute("CREATE TABLE IF NOT EXISTS controls (file TEXT, name_en TEXT, notes_de TEXT)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS controls_file ON controls(file)")
+        self.db.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+        self.db.commit()
+
+    @property
+    def _controls_table(self) -> str:
+        return "controls_fts" if self.fts else "controls"
+
+    def refresh(self) -> Dict[str, int]:
+        """Sync the catalog with the directory; returns counts of added/updated/touched/removed/unchanged files."""
+        stats = dict.fromkeys(("added", "updated", "touched", "removed", "unchanged"), 0)
+        known = {r["file"]: r for r in self.db.execute("SELECT file, mtime_ns, size, sha256 FROM profiles")}
+        seen = set()
+        with self.db:
+            for p in sorted(self.profiles_dir.glob("*.json")):
+                seen.add(p.name)
+                st = p.stat()
+                old = known.get(p.name)
+                if old and old["mtime_ns"] == st.st_mtime_ns and old["size"] == st.st_size:
+                    stats["unchanged"] += 1
+                    continue
+                raw = p.read_bytes()
+                sha = hashlib.sha256(raw).hexdigest()
+                if old and old["sha256"] == sha:
+                    self.db.execute("UPDATE profiles SET mtime_ns=?, size=? WHERE file=?", (st.st_mtime_ns, st.st_size, p.name))
+                    stats["touched"] += 1
+                    continue
+                try:
+                    obj = json.loads(raw.decode("utf-8"))
+                except Exception:
+                    obj = {"id": p.stem}
+                self._upsert(p.name, st, sha, obj, raw.decode("utf-8", errors="replace"))
+                stats["updated" if old else "added"] += 1
+            for name in set(known) - seen:
+                self.db.execute("DELETE FROM profiles WHERE file=?", (name,))
+                self.db.execute(f"DELETE FROM {self._controls_table} WHERE file=?", (name,))
+                stats["removed"] += 1
+        return stats
+
+    def _upsert(self, name: str, st, sha: str, obj: Dict[str, Any], text: str) -> None:
+        row = profile_row(obj)
+        if row["id"] is None:
+            row["id"] = Path(name).stem
+        self.db.execute(
+            "INSERT OR REPLACE INTO profiles VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (name, st.st_mtime_ns, st.st_size, sha,
+             row["id"], row["name_de"], row["manufacturer"], row["model"], row["priority_group"], row["category_de"],
+             row["controls_count"], row["manual_sources_count"], row["controls_completeness"],
+             int(row["manual_verified"]), int(row["panel_verified"]), int(bool(obj.get("enriched"))), text))
+        self.db.execute(f"DELETE FROM {self._controls_table} WHERE file=?", (name,))
+        self.db.executemany(f"INSERT INTO {self._controls_table} (file, name_en, notes_de) VALUES (?,?,?)",
+                            [(name, n, d) for n, d in _control_texts(obj)])
+
+    # ---------- queries ----------
+    def rows(self, where: str = "", params=()) -> List[Dict[str, Any]]:
+        """Coverage rows (ROW_COLUMNS), in file name order."""
+        cur = self.db.execute(f"SELECT {', '.join(ROW_COLUMNS)} FROM profiles {where} ORDER BY file", params)
+        out = []
+        for r in cur:
+            d = dict(r)
+            d["manual_verified"] = bool(d["manual_verified"])
+            d["panel_verified"] = bool(d["panel_verified"])
+            out.append(d)
+        return out
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        r = self.db.execute("SELECT json FROM profiles WHERE id=?", (profile_id,)).fetchone()
+        return json.loads(r["json"]) if r else None
+
+    def profiles(self) -> Iterator[Dict[str, Any]]:
+        """Every profile, parsed, in file name order."""
+        for r in self.db.execute("SELECT json FROM profiles ORDER BY file"):
+            yield json.loads(r["json"])
+
+    def by_manufacturer(self, manufacturer: str) -> List[Dict[str, Any]]:
+        return self.rows("WHERE manufacturer = ? COLLATE NOCASE", (manufacturer,))
+
+    def by_priority(self, group: str) -> List[Dict[str, Any]]:
+        return self.rows("WHERE priority_group = ?", (group,))
+
+    def unverified(self) -> List[Dict[str, Any]]:
+        return self.rows("WHERE manual_verified = 0 AND panel_verified = 0")
+
+    def search_controls(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Profiles whose control labels/notes match query (FTS5 syntax when available)."""
+        if self.fts:
+            sql = ("SELECT p.id, c.name_en, c.notes_de FROM controls_fts c JOIN profiles p ON p.file = c.file "
+                   "WHERE controls_fts MATCH ? ORDER BY rank LIMIT ?")
+            args = (query, limit)
+        else:
+            sql = ("SELECT p.id, c.name_en, c.notes_de FROM controls c JOIN profiles p ON p.file = c.file "
+                   "WHERE c.name_en LIKE ? OR c.notes_de LIKE ? LIMIT ?")
+            args = (f"%{query}%", f"%{query}%", limit)
+        return [dict(r) for r in self.db.execute(sql, args)]
+
+    def close(self) -> None:
+        self.db.close()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profiles-dir", type=Path, default=Path("Data/IFLS_Workbench/device_profiles"))
+    ap.add_argument("--db", type=Path, default=None, help="default: <profiles-dir>/../device_profiles_catalog.sqlite")
+    ap.add_argument("--search", default=None, help="full-text search over control labels")
+    ap.add_argument("--manufacturer", default=None)
+    ap.add_argument("--priority", default=None)
+    instrument.add_arguments(ap)
+    args = ap.parse_args()
+    instrument.start(args.trace, args.profile)
+
+    cat = ProfileCatalog(args.profiles_dir, args.db)
+    with instrument.span("catalog_refresh", profiles_dir=str(args.profiles_dir)) as s:
+        s.update(cat.refresh())
+    print("Catalog:", {k: v for k, v in s.items() if k != "profiles_dir"})
+    if args.search:
+        for r in cat.search_controls(args.search):
+            print(f"{r['id']}\t{r['name_en']}")
+    for rows in (cat.by_manufacturer(args.manufacturer) if args.manufacturer else None,
+                 cat.by_priority(args.priority) if args.priority else None):
+        for r in rows or []:
+            print(f"{r['id']}\t{r['name_de']}\t{r['priority_group']}")
+    cat.close()
+
+if __name__ == "__main__":
+    main()
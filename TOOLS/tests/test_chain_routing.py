@@ -0,0 +1,35 @@
+"""chain_routing reads the patchbay.json index (bit ch - 1) and copes with patchbays that have no inputs."""
+import chain_routing
+from chain_routing import Patchbay, mask, preset_inserts, solve
+from excel_to_json import build_channel_index
+
+def matrix(**devices):
+    channels = sorted({int(ch) for marks in devices.values() for ch in marks})
+    return {"channels": channels, "devices": [{"name": n, "map": m} for n, m in devices.items()]}
+
+OUTPUTS = matrix(Interface={"1": "present", "2": "present", "3": "left", "4": "right"}, Comp={"5": "present"})
+INPUTS = matrix(Interface={"1": "present", "2": "none", "3": "left", "4": "right"}, Comp={"6": "present"})
+PRESET = {"id": "p", "steps": [{"device_id": "fuzz"}, {"device_id": "comp"}]}
+
+def test_masks_match_the_index():
+    index = build_channel_index(OUTPUTS)
+    pb = Patchbay({"outputs": OUTPUTS, "inputs": INPUTS})
+    assert mask([3, 4]) == index["by_device"]["Interface"]["mask"] & 0b1100
+    assert pb.capacity("Comp") == (index["by_device"]["Comp"]["mask"], 1 << 5)
+
+def test_precomputed_index_is_used(monkeypatch):
+    data = {"outputs": OUTPUTS, "inputs": INPUTS,
+            "index": {"outputs": build_channel_index(OUTPUTS), "inputs": build_channel_index(INPUTS)}}
+    monkeypatch.setattr(chain_routing, "build_channel_index", None)
+    pb = Patchbay(data)
+    inserts = preset_inserts(PRESET, pb)
+    assert [(i.device, i.steps) for i in inserts] == [("Interface", ("fuzz",)), ("Comp", ("comp",))]
+    assert [(o.outs, o.ins) for o in solve(inserts, pb)] == [((1,), (1,)), ((5,), (6,))]
+    stereo = {**PRESET, "recommended_routing": {"mode": "stereo"}, "steps": PRESET["steps"][:1]}
+    assert [(o.outs, o.ins) for o in solve(preset_inserts(stereo, pb), pb)] == [((3, 4), (3, 4))]
+
+def test_outputs_only_patchbay_is_unroutable():
+    pb = Patchbay({"outputs": OUTPUTS})
+    assert pb.interface is None and pb.devices == {}
+    assert solve(preset_inserts(PRESET, pb), pb) is None
+    assert solve(preset_inserts({"id": "empty", "steps": []}, pb), pb) == []
@@ -0,0 +1,113 @@
+"""
+classify_priority / classify_batch pinned on Data/IFLS_Workbench/gear.json: a keyword change that moves a
+device to another priority group (or out of device_profiles_index.json) has to update this table.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from generate_device_profiles import classify_batch, classify_priority
+
+GEAR_JSON = Path(__file__).resolve().parents[2] / "Data" / "IFLS_Workbench" / "gear.json"
+
+EXPECTED = {
+    "presonus_studio_1824c": "routing",
+    "steinberg_ur22mkii": "routing",
+    "behringer_di4800a": "routing",
+    "dbx_266xs": "routing",
+    "tc_electronic_m350": "fx",
+    "behringer_dd400_digital_delay": "fx",
+    "electro_harmonix_deluxe_memory_boy": "fx",
+    "gokko_gk_22_dripping_delay": "fx",
+    "m_vave_elemental": "fx",
+    "amuzik_oem_rowin_tom_sline_fame_ocean_verb": "fx",
+    "behringer_dr100_digital_reverb": "routing",
+    "eno_t_cube_reverb": "fx",
+    "m_vave_mini_universe": "fx",
+    "aroma_amo_3_mario_bit_crusher": "fx",
+    "mooer_lofi_machine": "fx",
+    "dolamo_d_10_mixing_boost": "routing",
+    "aliexpress_mini_crunch_distortion": "fx",
+    "danelectro_bacon_n_eggs_dj_16": "fx",
+    "danelectro_fab_metal_d_3": "fx",
+    "danelectro_fab_fuzz_d_7": "fx",
+    "mosky_mini_muff": "fx",
+    "t_rex_tonebug_fuzz": "fx",
+    "aliexpress_mini_vintage_overdrive": "fx",
+    "palmer_bertreiber": "fx",
+    "flamma_fc11_envelope_filter": "fx",
+    "iset_analog_flanger": "fx",
+    "nux_mod_core_mk1": "fx",
+    "behringer_vp1_vintage_phaser": "fx",
+    "behringer_ut300_ultra_tremolo": "routing",
+    "golden_bull_tremolo": "fx",
+    "amuzik_oem_rowin_vibrock_re_02": "fx",
+    "electro_harmonix_attack_decay": "synth",
+    "irin_talent_octave": "synth",
+    "digitech_whammy_5": "synth",
+    "ginean_modulator_ringmod": "synth",
+    "behringer_bsy600": "synth",
+    "electro_harmonix_super_space_drum_pedal": "synth",
+    "arturia_keystep": "synth",
+    "novation_circuit_rhythm": "synth",
+    "oxi_instruments_oxi_one_mkii": "synth",
+    "behringer_xm8500": "routing",
+    "sennheiser_md_400": "routing",
+    "beyerdynamic_tg_v35_s": "routing",
+    "behringer_b_1": "routing",
+    "behringer_c_2": "routing",
+    "r_de_ntg4": "routing",
+    "mcm_36_010_telephone_pick_up_coil": None,
+    "soma_ether": "routing",
+    "zoom_f6": "fx",
+    "zoom_h5": "routing",
+    "lom_geof_n": None,
+    "korg_cm_300": "routing",
+    "zeppelin_cortado_mk_iii": None,
+    "synare_ehx_super_space_drum_syndrum": "synth",
+    "bontempi_ms_40": "synth",
+    "casio_sa_21": "synth",
+    "casio_vl_1_vl_tone": "synth",
+    "yamaha_pss_380": "synth",
+    "yamaha_pss_580": "synth",
+    "arturia_microfreak": "synth",
+    "behringer_neutron": "synth",
+    "behringer_edge": "synth",
+    "boss_cs_3_compression_sustainer": "routing",
+    "caline_10_band_eq": None,
+    "doremidi_midi_thru_3": "routing",
+    "doremidi_midi_thru_box": "routing",
+    "behringer_xenyx_1204_usb": "routing",
+    "boredbrain_patchulator_8000": "routing",
+    "behringer_di20": "routing",
+    "behringer_di400p": "routing",
+    "palmer_daccapo": "routing",
+    "mini_ab_y_channel_switch": "routing",
+    "sonicake_portal_qds_06": "routing",
+}
+
+@pytest.fixture(scope="module")
+def gear():
+    return json.loads(GEAR_JSON.read_text(encoding="utf-8"))["gear"]
+
+def test_every_item_is_pinned(gear):
+    assert sorted(it["id"] for it in gear) == sorted(EXPECTED)
+
+def test_classify_priority(gear):
+    assert {it["id"]: classify_priority(it) for it in gear} == EXPECTED
+
+def test_classify_batch_matches(gear):
+    assert dict(zip((it["id"] for it in gear), classify_batch(gear))) == EXPECTED
+
+@pytest.mark.parametrize("text, group", [
+    ("Distortion pedal", None),                # "di" inside a word
+    ("Behringer Model X", None),               # "ring" in Behringer, "mod" in model
+    ("MIDI Thru Box", None),
+    ("Passive DI box", "routing"),
+    ("Ring mod", "fx"),
+    ("Studio mic", "routing"),
+    ("Mini synth with delay", "synth"),
+])
+def test_word_boundaries(text, group):
+    assert classify_priority({"model": text}) == group
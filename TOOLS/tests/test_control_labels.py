@@ -0,0 +1,64 @@
+"""
+Golden corpus for the control label extractor: every text under Evidence/ must give the same labels as the
+original three-pass heuristic below (kept verbatim as the reference), and every offset must point at its label.
+A difference here needs an EXTRACTOR_VERSION bump, not an updated reference.
+"""
+import re
+from pathlib import Path
+
+import pytest
+
+from enrich_from_manual_map import extract_controls_from_text, label_offsets, pdf_to_text
+
+EVIDENCE = Path(__file__).resolve().parents[2] / "Evidence"
+TEXTS = sorted(p for p in EVIDENCE.rglob("*") if p.suffix in (".txt", ".md", ".json") and ".cache" not in p.parts)
+PDFS = sorted(EVIDENCE.rglob("*.pdf"))
+
+def reference_extract(txt: str):
+    # Heuristics: capture common pedal UI nouns
+    patterns = [
+        r"\b([A-Z][A-Z0-9/\-\s]{2,32}\b)\s+(KNOB|SWITCH|FOOTSWITCH|BUTTON|LED|JACK|INPUT|OUTPUT)",
+        r"\b(KNOB|SWITCH|FOOTSWITCH|BUTTON|LED|JACK|INPUT|OUTPUT)\b[:\s\-]+([A-Z][A-Z0-9/\-\s]{2,32}\b)",
+        r"\b(LEVEL|TONE|ATTACK|SUSTAIN|RATE|DEPTH|MIX|BIT|SAMPLE RATE|MODE|TYPE|TIME|FEEDBACK|REPEAT)\b",
+    ]
+    found = set()
+    upper = txt.upper()
+    for pat in patterns:
+        for m in re.finditer(pat, upper):
+            g = m.groups()
+            if len(g) == 2 and g[0] in ("KNOB","SWITCH","FOOTSWITCH","BUTTON","LED","JACK","INPUT","OUTPUT"):
+                label = g[1].strip()
+            elif len(g) == 2 and g[1] in ("KNOB","SWITCH","FOOTSWITCH","BUTTON","LED","JACK","INPUT","OUTPUT"):
+                label = g[0].strip()
+            else:
+                label = g[0].strip()
+            label = re.sub(r"\s+", " ", label).strip()
+            if 2 <= len(label) <= 40:
+                found.add(label)
+    # cleanup
+    out = []
+    for lab in sorted(found):
+        # avoid pure nouns
+        if lab in ("KNOB","SWITCH","FOOTSWITCH","BUTTON","LED","JACK","INPUT","OUTPUT"):
+            continue
+        out.append({"name_en": lab.title(), "type": "unknown", "notes_de": ""})
+    return out[:40]
+
+def check(txt: str):
+    assert extract_controls_from_text(txt) == reference_extract(txt)
+    upper = txt.upper()
+    for label, offsets in label_offsets(txt).items():
+        first = label.split(" ", 1)[0]
+        assert offsets == sorted(offsets) and all(upper.startswith(first, o) for o in offsets), label
+
+def test_corpus_is_not_empty():
+    assert len(TEXTS) >= 10 and PDFS
+
+@pytest.mark.parametrize("path", TEXTS, ids=lambda p: p.name)
+def test_evidence_text(path):
+    check(path.read_text(encoding="utf-8", errors="replace"))
+
+@pytest.mark.parametrize("path", PDFS, ids=lambda p: p.name)
+def test_evidence_manual(path):
+    pytest.importorskip("pypdf")
+    check(pdf_to_text(path, max_pages=0))
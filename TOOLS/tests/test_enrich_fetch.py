@@ -0,0 +1,94 @@
+"""
+Concurrent manual fetching against local HTTP servers: results come back in manual_map order whatever order the
+downloads finish in, no host ever sees more than --per-host requests at once, and --jobs N writes what --jobs 1 does.
+"""
+import csv
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import enrich_from_manual_map as enrich
+
+class Vendor(ThreadingHTTPServer):
+    """Serves /<label>.html?<ms> after <ms> milliseconds and records the peak number of requests in flight."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        srv = self.server
+        with srv.lock:
+            srv.active += 1
+            srv.peak = max(srv.peak, srv.active)
+        try:
+            path, _, delay = self.path.partition("?")
+            time.sleep(int(delay or 0) / 1000)
+            body = f"<html><body><p>{path.strip('/').split('.')[0].upper()} KNOB</p></body></html>".encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with srv.lock:
+                srv.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def vendors():
+    servers = [Vendor(), Vendor()]
+    for s in servers:
+        threading.Thread(target=s.serve_forever, daemon=True).start()
+    yield servers
+    for s in servers:
+        s.shutdown()
+        s.server_close()
+
+def urls(vendors, n=12):
+    # the first URLs answer slowest, so downloads finish in roughly reverse order
+    return [f"http://127.0.0.1:{vendors[i % 2].server_port}/label{i}.html?{(n - i) * 15}" for i in range(n)]
+
+def test_results_in_input_order_within_the_per_host_cap(vendors):
+    session = enrich.make_session(8)
+    got = [fut.result()[0] for fut in enrich.iter_fetched(urls(vendors), lambda u: enrich.fetch_text(u, session),
+                                                          jobs=8, per_host=2)]
+    session.close()
+    assert [enrich.html_to_text(b).strip() for b in got] == [f"LABEL{i} KNOB" for i in range(12)]
+    assert [s.peak for s in vendors] == [2, 2]
+
+def run_enrich(tmp_path, vendors, jobs):
+    root = tmp_path / f"jobs{jobs}"
+    profiles = root / "device_profiles"
+    profiles.mkdir(parents=True)
+    with (root / "manual_map.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "manual_url"])
+        for i, url in enumerate(urls(vendors)):
+            pid = f"dev{i // 2}"  # every device listed twice: manual_sources order shows the processing order
+            (profiles / f"{pid}.json").write_text(json.dumps({"id": pid}), encoding="utf-8")
+            w.writerow([pid, url])
+    enrich.main(["--manual-map", str(root / "manual_map.csv"), "--profiles-dir", str(profiles), "--no-cache",
+                 "--no-evidence-index", "--max", "100", "--jobs", str(jobs), "--per-host", "2"])
+    out = {p.name: json.loads(p.read_text(encoding="utf-8")) for p in sorted(profiles.iterdir())}
+    manifest = json.loads((root / "manual_enrich_manifest.json").read_text(encoding="utf-8"))["profiles"]
+    drop = ("checked_at", "last_attempt")
+    return out, {pid: {k: v for k, v in e.items() if k not in drop} for pid, e in manifest.items()}
+
+def test_concurrent_run_writes_what_the_serial_run_writes(tmp_path, vendors, monkeypatch):
+    monkeypatch.setattr(enrich, "now_utc", lambda: "2026-01-01T00:00:00+00:00")
+    serial = run_enrich(tmp_path, vendors, 1)
+    assert [s.peak for s in vendors] == [1, 1]
+    concurrent = run_enrich(tmp_path, vendors, 6)
+    assert concurrent == serial
+    assert Counter(len(p["manual_sources"]) for p in serial[0].values()) == {2: 6}
+    assert [s.peak for s in vendors] == [2, 2]
@@ -0,0 +1,26 @@
+"""Enrich manifest: a row is skipped only while its manual, the extractor and the written profile are unchanged."""
+import enrich_from_manual_map as enrich
+from enrich_from_manual_map import EXTRACTOR_VERSION, extractor_key, is_unchanged, queue_state
+
+URL = "https://vendor.example/manual.pdf"
+ENTRY = {"url": URL, "manual_sha256": "m1", "extractor_version": EXTRACTOR_VERSION, "output_sha256": "p1",
+         "state": "done", "checked_at": 1000}
+
+def test_unchanged_row_is_skipped():
+    assert is_unchanged(ENTRY, URL, "m1", "p1")
+
+def test_any_change_re_enriches():
+    assert not is_unchanged(None, URL, "m1", "p1")
+    assert not is_unchanged(ENTRY, URL + "?v2", "m1", "p1")      # manual moved
+    assert not is_unchanged(ENTRY, URL, "m2", "p1")              # manual content changed
+    assert not is_unchanged(ENTRY, URL, "m1", "p2")              # profile edited since
+    assert not is_unchanged(ENTRY, URL, "m1", "p1", extractor_key(pdf_max_pages=0))
+
+def test_extractor_version_bump_requeues_done_rows(monkeypatch):
+    recheck = 7 * 86400
+    assert queue_state(ENTRY, URL, "p1", EXTRACTOR_VERSION, 2000, recheck) == "fresh"
+    monkeypatch.setattr(enrich, "EXTRACTOR_VERSION", str(int(EXTRACTOR_VERSION) + 1))
+    bumped = enrich.extractor_key()
+    assert bumped != EXTRACTOR_VERSION
+    assert queue_state(ENTRY, URL, "p1", bumped, 2000, recheck) == "stale"
+    assert not is_unchanged(ENTRY, URL, "m1", "p1", bumped)
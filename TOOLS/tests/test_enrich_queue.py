@@ -0,0 +1,57 @@
+"""Enrich work queue: new rows first, then failed rows due for retry, then done rows due for a re-check."""
+import hashlib
+import json
+
+from enrich_from_manual_map import (EXTRACTOR_VERSION, RETRY_MAX_SECONDS, build_queue, mark_done, mark_failed,
+                                    retry_delay)
+
+DAY = 86400
+NOW = 100 * DAY
+
+def profiles(tmp_path, *ids):
+    shas = {}
+    for pid in ids:
+        raw = json.dumps({"id": pid}).encode("utf-8")
+        (tmp_path / f"{pid}.json").write_bytes(raw)
+        shas[pid] = hashlib.sha256(raw).hexdigest()
+    return shas
+
+def done(pid, sha, checked_at):
+    return mark_done({"url": f"u/{pid}", "manual_sha256": "m", "extractor_version": EXTRACTOR_VERSION,
+                      "output_sha256": sha, "last_attempt": int(checked_at)}, checked_at)
+
+def test_order_new_then_retry_then_recheck(tmp_path):
+    ids = ["stale_old", "stale_new", "fresh", "retry", "backoff", "new", "todo"]
+    shas = profiles(tmp_path, *ids)
+    rows = [{"id": pid, "manual_url": f"u/{pid}", "status": "todo" if pid == "todo" else ""} for pid in ids]
+    manifest = {
+        "stale_old": done("stale_old", shas["stale_old"], NOW - 30 * DAY),
+        "stale_new": done("stale_new", shas["stale_new"], NOW - 8 * DAY),
+        "fresh": done("fresh", shas["fresh"], NOW - DAY),
+        "retry": mark_failed(None, "u/retry", "boom", NOW - 2 * DAY, DAY),
+        "backoff": mark_failed(None, "u/backoff", "boom", NOW - 3600, DAY),
+    }
+    queue, states = build_queue(rows, manifest, tmp_path, EXTRACTOR_VERSION, NOW, 7 * DAY)
+    assert [r["id"] for r in queue] == ["todo", "new", "retry", "stale_old", "stale_new"]
+    assert states == {"new": 2, "retry": 1, "stale": 2, "fresh": 1, "backoff": 1}
+
+def test_force_queues_everything_least_recently_attempted_first(tmp_path):
+    shas = profiles(tmp_path, "a", "b")
+    rows = [{"id": "a", "manual_url": "u/a"}, {"id": "b", "manual_url": "u/b"}]
+    queue, _ = build_queue(rows, {"a": done("a", shas["a"], NOW)}, tmp_path, EXTRACTOR_VERSION, NOW, 7 * DAY,
+                           force=True)
+    assert [r["id"] for r in queue] == ["b", "a"]
+
+def test_backoff_doubles_up_to_the_cap():
+    assert [retry_delay(n, 3600) for n in (1, 2, 3, 4)] == [3600, 7200, 14400, 28800]
+    assert retry_delay(20, 3600) == RETRY_MAX_SECONDS
+    entry = None
+    for n in range(1, 4):
+        entry = mark_failed(entry, "u", "boom", NOW, 3600)
+        assert (entry["attempts"], entry["next_attempt"]) == (n, NOW + 3600 * 2 ** (n - 1))
+
+def test_success_resets_the_backoff():
+    failed = mark_failed(mark_failed(None, "u", "boom", NOW, 3600), "u", "boom", NOW, 3600)
+    entry = mark_done(failed, NOW)
+    assert entry["state"] == "done" and not {"attempts", "error", "next_attempt"} & set(entry)
+    assert mark_failed(entry, "u", "boom", NOW, 3600)["attempts"] == 1
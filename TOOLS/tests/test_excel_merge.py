@@ -0,0 +1,41 @@
+"""Merging converted sheets in excel_to_json: gear counts add up across sheets, patchbays stay separate."""
+from excel_to_json import build_meta, merge_gear, merge_patchbay
+
+def gear_part(sheet, *rows):
+    gear = [{"id": f"{man}_{model}".lower(), "manufacturer": man, "model": model, "count": n, "notes_text": note}
+            for man, model, n, note in rows]
+    return {"meta": build_meta({"file": "gear.xlsx", "sheet": sheet}), "gear": gear}
+
+def matrix(channels, **devices):
+    return {"channels": channels,
+            "devices": [{"name": name, "map": dict(zip(map(str, channels), marks))} for name, marks in devices.items()]}
+
+def patchbay_part(sheet, outputs):
+    return {"meta": build_meta({"file": "pb.xlsx", "sheet": sheet}), "outputs": outputs}
+
+def test_gear_counts_add_up_across_sheets():
+    data = merge_gear([
+        gear_part("home", ("Boss", "DD3", 1, ""), ("Boss", "DD3", 2, "")),
+        gear_part("studio", ("Boss", "DD3", 1, "spare"), ("Moog", "M32", 1, "")),
+    ])
+    dd3, m32 = data["gear"]
+    assert (dd3["count"], dd3["notes_text"], m32["count"]) == (3, "spare", 1)
+    assert [s["duplicates"] for s in data["meta"]["source_files"]] == [1, 1]
+
+def test_patchbays_are_not_merged_by_channel_number():
+    a = matrix([1, 2], Interface=["present", "none"])
+    b = matrix([1, 2], Interface=["none", "present"], Pedal=["present", "none"])
+    data = merge_patchbay([patchbay_part("A", a), patchbay_part("B", b)])
+    assert data["outputs"] == a
+    assert [pb["source"]["sheet"] for pb in data["patchbays"]] == ["A", "B"]
+    assert data["patchbays"][1]["index"]["outputs"]["by_channel"]["1"] == {"Pedal": "present"}
+
+def test_single_patchbay_has_no_patchbays_list():
+    data = merge_patchbay([patchbay_part("A", matrix([1], Interface=["present"]))])
+    assert "patchbays" not in data and data["index"]["outputs"]["free_channels"] == []
+
+def test_repeated_device_rows_within_one_matrix_are_merged():
+    m = {"channels": [1, 2], "devices": [{"name": "Interface", "map": {"1": "present", "2": "none"}},
+                                         {"name": "Interface", "map": {"1": "none", "2": "left"}}]}
+    data = merge_patchbay([patchbay_part("A", m)])
+    assert data["outputs"]["devices"] == [{"name": "Interface", "map": {"1": "present", "2": "left"}}]
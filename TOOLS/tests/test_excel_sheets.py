@@ -0,0 +1,39 @@
+"""Sheet selection and per-sheet errors in excel_to_json: chartsheets are skipped, broken sheets are named."""
+import pytest
+
+from excel_to_json import GEAR_COLUMNS, convert_gear_xlsx, convert_sources, select_sheets
+
+openpyxl = pytest.importorskip("openpyxl")
+
+def workbook(path, chart_first=False):
+    from openpyxl.chart import BarChart, Reference
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "gear"
+    ws.append(GEAR_COLUMNS)
+    for man, model, n in [("Boss", "DD3", 2), ("Moog", "M32", 1)]:
+        ws.append({GEAR_COLUMNS.index(k) + 1: v for k, v in [("Hersteller", man), ("Modell", model), ("Anzahl", n)]})
+    chart = BarChart()
+    chart.add_data(Reference(ws, min_col=GEAR_COLUMNS.index("Anzahl") + 1, min_row=1, max_row=3), titles_from_data=True)
+    cs = wb.create_chartsheet("counts", 0 if chart_first else None)
+    cs.add_chart(chart)
+    wb.active = 0
+    wb.save(path)
+    return path
+
+@pytest.mark.parametrize("chart_first", [False, True])
+def test_chartsheets_are_not_selected(tmp_path, chart_first):
+    path = workbook(tmp_path / "gear.xlsx", chart_first)
+    assert select_sheets(path, "all") == ["gear"]
+    assert select_sheets(path, "active") == ["gear"]
+    assert select_sheets(path, "counts") == []
+    data = convert_sources(convert_gear_xlsx, [path], jobs=1)
+    assert [g["count"] for g in data["gear"]] == [2, 1]
+
+def broken(path, sheet):
+    raise KeyError("merged cell")
+
+def test_unexpected_error_names_workbook_and_sheet(tmp_path):
+    path = workbook(tmp_path / "gear.xlsx")
+    with pytest.raises(RuntimeError, match=r"gear\.xlsx \[gear\]: KeyError"):
+        convert_sources(broken, [path], jobs=1)
@@ -0,0 +1,27 @@
+"""gear_ids: collisions get fresh ids and are reported once, near-duplicates are reported separately."""
+from pathlib import Path
+
+import excel_to_json
+import gear_ids
+from excel_to_json import slug_id
+from gear_ids import GearIds
+
+def resolve_all(ids, *devices):
+    return [ids.resolve(slug_id(man, model), man, model) for man, model in devices]
+
+def test_collision_is_not_also_a_near_duplicate():
+    ids = GearIds()
+    got = resolve_all(ids, ("Behringer", "C-2"), ("Behringer", "C 2"), ("Moog", "Mother-32"), ("Moog", "Mother 32x"))
+    assert [pid for pid, _ in got] == ["behringer_c_2", "behringer_c_2_2", "moog_mother_32", "moog_mother_32x"]
+    assert ids.collisions == {"behringer_c_2": ["behringer_c_2", "behringer_c_2_2"]}
+    assert [nd["ids"] for nd in ids.near_duplicates] == [["moog_mother_32", "moog_mother_32x"]]
+    assert ids.report() == ["Id collision on behringer_c_2: behringer_c_2, behringer_c_2_2",
+                            "Near-duplicate (0.91): moog_mother_32 / moog_mother_32x"]
+
+def test_same_device_twice_is_a_duplicate():
+    ids = GearIds()
+    assert resolve_all(ids, ("Boss", "DD-3"), ("BOSS", "DD‑3")) == [("boss_dd_3", False), ("boss_dd_3", True)]
+    assert ids.collisions == {} and ids.near_duplicates == []
+
+def test_converter_hash_covers_id_assignment():
+    assert Path(gear_ids.__file__) in excel_to_json.CONVERTER_MODULES
@@ -0,0 +1,54 @@
+"""generate_device_profiles: streamed index bytes, write-if-changed, --only, and no temp files left on errors."""
+import json
+from pathlib import Path
+
+import pytest
+
+from generate_device_profiles import JsonArrayWriter, generate_profiles, iter_gear
+
+GEAR_JSON = Path(__file__).resolve().parents[2] / "Data/IFLS_Workbench/gear.json"
+GEAR = json.loads(GEAR_JSON.read_text(encoding="utf-8"))
+
+@pytest.mark.parametrize("items", [[], [{"id": "a", "tags": ["ü", "x"], "n": {"k": [1, 2.5, None]}}, {"id": "b"}]])
+def test_writer_matches_json_dumps(tmp_path, items):
+    head = {"meta": {"generated_at_utc": "2026-01-01T00:00:00+00:00", "note": "Röhre"}}
+    with JsonArrayWriter(tmp_path / "index.json", head, "devices") as w:
+        for it in items:
+            w.append(it)
+    expected = json.dumps({**head, "devices": items}, ensure_ascii=False, indent=2) + "\n"
+    assert (tmp_path / "index.json").read_text(encoding="utf-8") == expected
+    assert [p.name for p in tmp_path.iterdir()] == ["index.json"]
+
+def run(tmp_path, items, only=None):
+    return generate_profiles(iter(items), "gear.json", tmp_path / "profiles", tmp_path / "docs", only=only)
+
+def test_second_run_writes_nothing(tmp_path):
+    total, written = run(tmp_path, GEAR["gear"])
+    assert total == written > 0
+    before = {p: p.read_bytes() for p in tmp_path.rglob("*") if p.is_file()}
+    assert run(tmp_path, GEAR["gear"]) == (total, 0)
+    assert {p: p.read_bytes() for p in tmp_path.rglob("*") if p.is_file()} == before
+
+def test_only_rewrites_the_named_profiles(tmp_path):
+    total, _ = run(tmp_path, GEAR["gear"])
+    ids = [d["id"] for d in json.loads((tmp_path / "device_profiles_index.json").read_text(encoding="utf-8"))["devices"]]
+    changed = [{**it, "count": it["count"] + 1} for it in GEAR["gear"]]
+    assert run(tmp_path, changed, only={ids[0]}) == (total, 1)
+    counts = {p.stem: json.loads(p.read_text(encoding="utf-8"))["count"] for p in (tmp_path / "profiles").iterdir()}
+    orig = {it["id"]: it["count"] for it in GEAR["gear"]}
+    assert [pid for pid in ids if counts[pid] != orig[pid]] == [ids[0]]
+    index = json.loads((tmp_path / "device_profiles_index.json").read_text(encoding="utf-8"))
+    assert [d["id"] for d in index["devices"]] == ids
+
+def test_error_leaves_no_temp_files(tmp_path):
+    def items():
+        yield from GEAR["gear"][:10]
+        raise RuntimeError("broken inventory")
+
+    with pytest.raises(RuntimeError):
+        generate_profiles(items(), "gear.json", tmp_path / "profiles", tmp_path / "docs")
+    assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == []
+
+def test_streamed_gear_json_matches_a_full_load():
+    pytest.importorskip("ijson")
+    assert list(iter_gear(GEAR_JSON)) == GEAR["gear"]
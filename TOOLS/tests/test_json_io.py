@@ -0,0 +1,33 @@
+"""json_io: identical serialization and crash-safe batched writes."""
+import json
+
+import pytest
+
+import json_io
+
+def test_dumps_matches_stdlib():
+    obj = {"a": [1, "ü", None, True], "b": {"c": 1.5, "d": (1, 2)}, "e": "\ud800"}
+    assert json_io.dumps(obj) == json.dumps(obj, ensure_ascii=False, indent=2)
+
+def test_batch_fsyncs_every_file_before_any_rename(tmp_path, monkeypatch):
+    events = []
+    real_fsync, real_replace = json_io.os.fsync, json_io.os.replace
+    monkeypatch.setattr(json_io.os, "fsync", lambda fd: (events.append("fsync"), real_fsync(fd)))
+    monkeypatch.setattr(json_io.os, "replace", lambda a, b: (events.append("rename"), real_replace(a, b)))
+    monkeypatch.delattr(json_io.os, "sync", raising=False)  # must not be needed (Windows has none)
+    with json_io.Batch() as batch:
+        for name in ("a.json", "b.json"):
+            batch.write(tmp_path / name, name)
+    assert events[:3] == ["fsync", "fsync", "rename"]
+    assert (tmp_path / "b.json").read_text(encoding="utf-8") == "b.json"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.json", "b.json"]
+
+def test_batch_error_leaves_old_files(tmp_path):
+    target = tmp_path / "a.json"
+    target.write_text("old", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with json_io.Batch() as batch:
+            batch.write(target, "new")
+            raise RuntimeError
+    assert [p.name for p in tmp_path.iterdir()] == ["a.json"]
+    assert target.read_text(encoding="utf-8") == "old"
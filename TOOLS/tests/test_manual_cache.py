@@ -0,0 +1,66 @@
+"""manual_cache: stale-if-error only for outages, offline misses are CacheMiss and leave the enrich queue alone."""
+import csv
+import json
+
+import pytest
+import requests
+
+import enrich_from_manual_map
+from manual_cache import CacheMiss, ManualCache
+
+URL = "https://vendor.example/manual.pdf"
+
+def response(status, body=b"", headers=None):
+    r = requests.Response()
+    r.status_code, r._content, r.url = status, body, URL
+    r.headers.update(headers or {})
+    return r
+
+class Session:
+    """Answers every GET with the next queued response, or raises it if it is an exception."""
+    def __init__(self, *answers):
+        self.answers = list(answers)
+
+    def get(self, url, timeout=None, headers=None):
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+@pytest.fixture
+def cache(tmp_path):
+    c = ManualCache(tmp_path / "cache")
+    c.fetch_path(URL, Session(response(200, b"%PDF old", {"etag": '"1"'})))
+    return c
+
+@pytest.mark.parametrize("error", [response(503), response(500), requests.ConnectionError("down"),
+                                   requests.Timeout("slow")], ids=["503", "500", "connection", "timeout"])
+def test_outage_serves_the_cached_copy(cache, error):
+    path, _ = cache.fetch_path(URL, Session(error))
+    assert path.read_bytes() == b"%PDF old" and cache.stats["stale"] == 1
+
+@pytest.mark.parametrize("status", [404, 410, 403])
+def test_client_error_is_passed_on(cache, status):
+    with pytest.raises(requests.HTTPError):
+        cache.fetch_path(URL, Session(response(status)))
+    assert cache.stats["stale"] == 0
+
+def test_offline_miss_is_a_cache_miss(tmp_path):
+    with pytest.raises(CacheMiss):
+        ManualCache(tmp_path / "cache", offline=True).fetch_path(URL, None)
+
+def test_cache_only_miss_is_not_an_attempt(tmp_path, capsys):
+    profiles = tmp_path / "device_profiles"
+    profiles.mkdir()
+    with (tmp_path / "manual_map.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "manual_url"])
+        for pid in ("a", "b"):
+            (profiles / f"{pid}.json").write_text(json.dumps({"id": pid}), encoding="utf-8")
+            w.writerow([pid, f"https://vendor.example/{pid}.pdf"])
+    enrich_from_manual_map.main(["--manual-map", str(tmp_path / "manual_map.csv"), "--profiles-dir", str(profiles),
+                                 "--cache-dir", str(tmp_path / "cache"), "--cache-only", "--no-evidence-index",
+                                 "--max", "1"])
+    assert "failed: 0; not in cache: 2" in capsys.readouterr().out
+    assert [json.loads(p.read_text(encoding="utf-8")) for p in sorted(profiles.iterdir())] == [{"id": "a"}, {"id": "b"}]
+    assert json.loads((tmp_path / "manual_enrich_manifest.json").read_text(encoding="utf-8"))["profiles"] == {}
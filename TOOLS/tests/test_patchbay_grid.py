@@ -0,0 +1,53 @@
+"""Patchbay grid parsing in excel_to_json: the wide and the legacy tall layout give the same ports."""
+import re
+import zipfile
+
+import pytest
+
+from excel_to_json import convert_patchbay_xlsx
+
+openpyxl = pytest.importorskip("openpyxl")
+
+OUTPUTS = {"Interface": ["✓", "✓", "x"], "Compressor": ["x", "✓ links", "✓ rechts"]}
+INPUTS = {"Interface": ["x", "✓"], "Reamp": ["✓ sidechain in", "x"]}
+
+def save(rows, path):
+    wb = openpyxl.Workbook()
+    for row in rows:
+        wb.active.append(row)
+    wb.save(path)
+    return path
+
+def wide(path):
+    rows = [["Output Kanal Patchbay (oben)", "1", "2", "3"], *([n, *m] for n, m in OUTPUTS.items()), [],
+            ["Input Kanal Patchbay (unten)", "1", "2"], *([n, *m] for n, m in INPUTS.items())]
+    return save(rows, path)
+
+def tall(path):
+    def block(matrix):
+        names = list(matrix)
+        return [["Kanal", *names], *([ch, *(matrix[n][ch - 1] for n in names)]
+                                     for ch in range(1, len(matrix[names[0]]) + 1))]
+    return save([["Output Patchbay"], *block(OUTPUTS), [], ["Input Patchbay"], *block(INPUTS)], path)
+
+def ports(data, key):
+    return {d["name"]: list(d["map"].values()) for d in data[key]["devices"]}, data[key]["channels"]
+
+@pytest.mark.parametrize("layout", [wide, tall])
+def test_layouts_parse_to_the_same_ports(tmp_path, layout):
+    data = convert_patchbay_xlsx(layout(tmp_path / "pb.xlsx"))
+    assert ports(data, "outputs") == ({"Interface": ["present", "present", "none"],
+                                       "Compressor": ["none", "left", "right"]}, [1, 2, 3])
+    assert ports(data, "inputs") == ({"Interface": ["none", "present"], "Reamp": ["sidechain_in", "none"]}, [1, 2])
+    assert data["index"]["outputs"]["free_channels"] == []
+
+def test_stale_dimension_does_not_truncate_the_grid(tmp_path):
+    path = tall(tmp_path / "pb.xlsx")
+    stale = tmp_path / "stale.xlsx"
+    with zipfile.ZipFile(path) as src, zipfile.ZipFile(stale, "w") as dst:
+        for item in src.infolist():
+            raw = src.read(item)
+            if item.filename == "xl/worksheets/sheet1.xml":
+                raw = re.sub(rb'<dimension ref="[^"]*"', b'<dimension ref="A1:B2"', raw)
+            dst.writestr(item, raw)
+    assert convert_patchbay_xlsx(stale)["outputs"] == convert_patchbay_xlsx(path)["outputs"]
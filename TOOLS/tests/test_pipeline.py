@@ -0,0 +1,40 @@
+"""pipeline: stages never run next to a stage that writes what they read, fingerprints ignore mtimes."""
+import argparse
+import os
+
+from pipeline import Stage, build_stages
+
+def stages(tmp_path):
+    args = argparse.Namespace(gear_xlsx=[tmp_path / "gear.xlsx"], patchbay_xlsx=[tmp_path / "pb.xlsx"],
+                              data_dir=tmp_path / "data", manual_map=None, docs_dir=tmp_path / "docs",
+                              evidence_dir=tmp_path / "Evidence", jobs=1, enrich_max=0, cache_only=True)
+    return {s.name: s for s in build_stages(args)}
+
+def ancestors(graph, name):
+    seen, todo = set(), list(graph[name].deps)
+    while todo:
+        d = todo.pop()
+        if d not in seen:
+            seen.add(d)
+            todo.extend(graph[d].deps)
+    return seen
+
+def test_profile_readers_wait_for_the_last_writer(tmp_path):
+    graph = stages(tmp_path)
+    profiles_dir = tmp_path / "data" / "device_profiles"
+    readers = {n for n, s in graph.items() if profiles_dir in s.paths} - {"profiles", "enrich"}
+    assert readers == {"routing", "coverage", "evidence"}
+    assert all("enrich" in ancestors(graph, n) for n in readers)
+
+def test_catalog_users_run_one_after_the_other(tmp_path):
+    graph = stages(tmp_path)
+    assert "coverage" in ancestors(graph, "evidence")
+
+def test_directory_fingerprint_ignores_mtime(tmp_path):
+    (tmp_path / "a.json").write_text("{}", encoding="utf-8")
+    stage = Stage("s", [], [tmp_path], [], {}, lambda results: None)
+    before = stage.fingerprint()
+    os.utime(tmp_path / "a.json", (0, 0))
+    assert stage.fingerprint() == before
+    (tmp_path / "a.json").write_text("{ }", encoding="utf-8")
+    assert stage.fingerprint() != before
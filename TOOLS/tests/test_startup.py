@@ -0,0 +1,19 @@
+"""
+Startup guard: importing the scripts must not pull in the heavy libraries they only need for some commands
+(benchmark.py measures the time; this pins the cause, so a module-level import creeping back fails here).
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+TOOLS_DIR = Path(__file__).resolve().parents[1]
+SCRIPTS = ["excel_to_json", "generate_device_profiles", "enrich_from_manual_map", "pipeline"]
+HEAVY = ["pandas", "openpyxl", "requests", "pypdf"]
+
+@pytest.mark.parametrize("module", SCRIPTS)
+def test_import_stays_light(module):
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    r = subprocess.run([sys.executable, "-c", code], cwd=TOOLS_DIR, capture_output=True, text=True, check=True)
+    assert r.stdout.strip() == ""